@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+from config import BacktestConfig
+
+TAKER_FEE = 0.0004
+
+OPEN_LONG, CLOSE_LONG, OPEN_SHORT, CLOSE_SHORT = 0, 1, 2, 3
+TRADE_TYPES = ['Open Long', 'Close Long', 'Open Short', 'Close Short']
+
+BACKTEST_COLUMNS = ['close', 'volume', 'Average_Volume', 'ADX', 'RSI_6', 'EMA_7', 'EMA_25', 'EMA_99']
+
+
+class BacktestArrays:
+    """
+    Indicator columns of a history as contiguous float64 arrays plus the per-candle trend,
+    computed once and shared by every strategy configuration run over the same history.
+    """
+    def __init__(self, history):
+        self.timestamps = pd.DatetimeIndex(history.index)
+        for column in BACKTEST_COLUMNS:
+            setattr(self, column, np.ascontiguousarray(history[column].to_numpy(dtype=np.float64)))
+        self.derive_trend()
+
+    @classmethod
+    def from_columns(cls, columns, timestamps=None):
+        """Wraps existing arrays (e.g. shared memory views) without copying them."""
+        arrays = cls.__new__(cls)
+        arrays.timestamps = timestamps
+        for column in BACKTEST_COLUMNS:
+            setattr(arrays, column, columns[column])
+        arrays.derive_trend()
+        return arrays
+
+    def slice(self, start, end):
+        """Candles [start, end) as views: indicators were computed on the whole history, so no warmup is lost."""
+        timestamps = self.timestamps[start:end] if self.timestamps is not None else None
+        return BacktestArrays.from_columns({column: getattr(self, column)[start:end] for column in BACKTEST_COLUMNS},
+                                           timestamps)
+
+    def derive_trend(self):
+        # same comparisons as trade_logic.determine_trend, NaN compares as False there too
+        self.trend_long = ~(self.EMA_7 < self.EMA_25)
+        self.trend_strong = np.where(self.trend_long, ~(self.EMA_7 < self.EMA_99), self.EMA_7 < self.EMA_99)
+        self.high_volume = self.volume > self.Average_Volume
+
+    def __len__(self):
+        return len(self.close)
+
+
+class BacktestLedger:
+    def __init__(self, strategy_config, initial_capital):
+        self.leverage = strategy_config.leverage
+        self.current_capital = initial_capital
+        self.allocated_capital = 0
+        self.cumulative_profit_loss = 0
+        self.total_commission = 0.0
+        self.successful_trades = 0
+        self.unsuccessful_trades = 0
+        self.peak_profit_loss = 0
+        self.max_drawdown = 0
+        # index, trade type, comment, price, size, profit/loss, capital and P&L after the trade
+        self.trades = []
+
+    def record(self, index, trade_type, comment, price, size, profit_loss):
+        commission = size * TAKER_FEE
+        self.total_commission += commission
+        self.cumulative_profit_loss += profit_loss
+
+        if trade_type == OPEN_LONG or trade_type == OPEN_SHORT:
+            self.current_capital -= size
+            self.allocated_capital += size
+        else:
+            self.current_capital += size + profit_loss
+            self.allocated_capital = 0
+            if profit_loss < 0.0:
+                self.unsuccessful_trades += 1
+            else:
+                self.successful_trades += 1
+
+            self.peak_profit_loss = max(self.peak_profit_loss, self.cumulative_profit_loss)
+            self.max_drawdown = max(self.max_drawdown, self.peak_profit_loss - self.cumulative_profit_loss)
+
+        self.trades.append((index, trade_type, comment, price, size, profit_loss, commission,
+                            self.current_capital, self.allocated_capital, self.cumulative_profit_loss))
+
+
+class BacktestResult:
+    def __init__(self, strategy_config, ledger, timestamps):
+        self.strategy_config = strategy_config
+        self.ledger = ledger
+        self.timestamps = timestamps
+
+    @property
+    def trade_count(self):
+        return len(self.ledger.trades)
+
+    def win_rate(self):
+        closed = self.ledger.successful_trades + self.ledger.unsuccessful_trades
+        return self.ledger.successful_trades / max(1, closed) * 100
+
+    def summary(self):
+        return {
+            'pnl': self.ledger.cumulative_profit_loss,
+            'win_rate': self.win_rate(),
+            'max_drawdown': self.ledger.max_drawdown,
+            'trades': self.trade_count,
+            'commission': self.ledger.total_commission,
+        }
+
+    def stats(self):
+        """Fields of state.StrategyStats, to be applied with StrategyStats.load."""
+        ledger = self.ledger
+        return {
+            'current_capital': ledger.current_capital,
+            'allocated_capital': ledger.allocated_capital,
+            'cumulative_profit_loss': ledger.cumulative_profit_loss,
+            'total_commission': ledger.total_commission,
+            'successful_trades': ledger.successful_trades,
+            'unsuccessful_trades': ledger.unsuccessful_trades,
+        }
+
+    def trade_logs(self):
+        """Trades in the trade_logs row format written by trade_drop.update_balance_and_stats."""
+        leverage = self.ledger.leverage
+        logs = []
+        for (index, trade_type, comment, price, size, profit_loss, commission,
+             current_capital, allocated_capital, cumulative_profit_loss) in self.ledger.trades:
+            logs.append({
+                'timestamp': self.timestamps[index].strftime('%d.%m.%Y %H:%M'),
+                'trade_type': TRADE_TYPES[trade_type],
+                'price': price,
+                'size': size,
+                'leverage': leverage,
+                'full_size': size * leverage,
+                'current_balance': round(current_capital, 2),
+                'allocated_capital': round(allocated_capital, 2),
+                'comment': comment,
+                'profit_loss': round(profit_loss, 2),
+                'cumulative_profit_loss': round(cumulative_profit_loss, 2),
+                'commission': round(commission, 2),
+            })
+        return logs
+
+
+def eligible_candles(arrays, strategy_config):
+    """Candles where trade_logic gets past its ADX, volume and trend-strength checks."""
+    eligible = arrays.ADX > strategy_config.min_adx
+    if strategy_config.high_volume_only:
+        eligible &= arrays.high_volume
+    if not strategy_config.allow_weak_trend:
+        eligible &= arrays.trend_strong
+    return np.flatnonzero(eligible)
+
+
+def run_backtest(arrays, strategy_config, initial_capital=None):
+    """
+    Runs the trade_logic entry/exit/DCA/trend-reversal rules over precomputed arrays with an
+    in-memory ledger: no order client, database, price tracker or Telegram. Trades are filled
+    at the candle close.
+    """
+    if not isinstance(arrays, BacktestArrays):
+        arrays = BacktestArrays(arrays)
+
+    config = strategy_config
+    ledger = BacktestLedger(config, BacktestConfig.INITIAL_CAPITAL if initial_capital is None else initial_capital)
+    position_size = config.position_size
+    close_on_trend_reverse = config.close_on_trend_reverse
+    long_enter, long_additional, long_exit = config.long_buy_rsi_enter, config.long_buy_additional_enter, config.long_buy_rsi_exit
+    short_enter, short_additional, short_exit = config.short_sell_rsi_enter, config.short_sell_additional_enter, config.short_sell_rsi_exit
+
+    indices = eligible_candles(arrays, config)
+    rsi_values = arrays.RSI_6[indices].tolist()
+    prices = arrays.close[indices].tolist()
+    trend_long = arrays.trend_long[indices].tolist()
+
+    # mirrors state.PositionState: averaged entry price, margin and leveraged size per side
+    long_opened = short_opened = False
+    long_positions = short_positions = 0
+    long_price = long_size = long_full_size = 0.0
+    short_price = short_size = short_full_size = 0.0
+
+    for index, rsi, price, is_long in zip(indices.tolist(), rsi_values, prices, trend_long):
+        if is_long:
+            if short_opened and close_on_trend_reverse:
+                profit_loss = round((short_price - price) * (short_full_size / short_price), 2)
+                ledger.record(index, CLOSE_SHORT, "Trend reversal", price, short_size, profit_loss)
+                short_opened = False
+                short_positions, short_price, short_size, short_full_size = 0, 0.0, 0.0, 0.0
+
+            if long_opened and rsi > long_exit:
+                profit_loss = round((price - long_price) * (long_full_size / long_price), 2)
+                ledger.record(index, CLOSE_LONG, f"RSI > {long_exit}", price, long_size, profit_loss)
+                long_opened = False
+                long_positions, long_price, long_size, long_full_size = 0, 0.0, 0.0, 0.0
+
+            if not long_opened and rsi < long_enter:
+                long_opened = True
+                long_positions += 1
+                long_full_size += position_size * ledger.leverage
+                long_size += position_size
+                long_price = (long_price + price) / long_positions
+                ledger.record(index, OPEN_LONG, f"RSI < {long_enter}", price, position_size, 0.0)
+
+            if long_opened and long_positions == 1 and rsi < long_additional:
+                long_positions += 1
+                long_full_size += position_size * ledger.leverage
+                long_size += position_size
+                long_price = (long_price + price) / long_positions
+                ledger.record(index, OPEN_LONG, f"DCA RSI < {long_additional}", price, position_size, 0.0)
+        else:
+            if long_opened and close_on_trend_reverse:
+                profit_loss = round((price - long_price) * (long_full_size / long_price), 2)
+                ledger.record(index, CLOSE_LONG, "Trend reversal", price, long_size, profit_loss)
+                long_opened = False
+                long_positions, long_price, long_size, long_full_size = 0, 0.0, 0.0, 0.0
+
+            if short_opened and rsi < short_exit:
+                profit_loss = round((short_price - price) * (short_full_size / short_price), 2)
+                ledger.record(index, CLOSE_SHORT, f"RSI < {short_exit}", price, short_size, profit_loss)
+                short_opened = False
+                short_positions, short_price, short_size, short_full_size = 0, 0.0, 0.0, 0.0
+
+            if not short_opened and rsi > short_enter:
+                short_opened = True
+                short_positions += 1
+                short_full_size += position_size * ledger.leverage
+                short_size += position_size
+                short_price = (short_price + price) / short_positions
+                ledger.record(index, OPEN_SHORT, f"RSI > {short_enter}", price, position_size, 0.0)
+
+            if short_opened and short_positions == 1 and rsi > short_additional:
+                short_positions += 1
+                short_full_size += position_size * ledger.leverage
+                short_size += position_size
+                short_price = (short_price + price) / short_positions
+                ledger.record(index, OPEN_SHORT, f"DCA RSI > {short_additional}", price, position_size, 0.0)
+
+    return BacktestResult(config, ledger, arrays.timestamps)
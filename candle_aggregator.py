@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+
+from candle_store import CandleStore
+from config import RealTimeConfig
+from indicators import calculate_indicators
+from logger_output import log_error
+from streaming_indicators import StreamingIndicators, OHLCV_COLUMNS
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def open_times_ms(index):
+    return index.values.astype('datetime64[ms]').view(np.int64)
+
+
+def aggregate(df, interval_ms, step_ms):
+    """
+    Base candles into `interval_ms` candles labeled by open time, aligned to UTC like the
+    exchange's own. Buckets with a missing base candle are dropped.
+    """
+    buckets = open_times_ms(df.index) // interval_ms * interval_ms
+    grouped = df.groupby(buckets).agg(open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+                                      close=('close', 'last'), volume=('volume', 'sum'), count=('close', 'size'))
+    grouped = grouped[grouped['count'] == interval_ms // step_ms]
+
+    aggregated = grouped[OHLCV_COLUMNS]
+    aggregated.index = pd.to_datetime(grouped.index, unit='ms')
+    aggregated.index.name = 'timestamp'
+    return aggregated
+
+
+def merge_candle(partial, candle):
+    """OHLCV of `partial` extended by the next base candle, a new dict."""
+    if partial is None:
+        return {column: float(candle[column]) for column in OHLCV_COLUMNS}
+    return {'close': float(candle['close']), 'high': max(partial['high'], float(candle['high'])),
+            'low': min(partial['low'], float(candle['low'])), 'open': partial['open'],
+            'volume': partial['volume'] + float(candle['volume'])}
+
+
+class CandleAggregator:
+    """
+    One higher timeframe built from the base interval stream, with its own incremental
+    indicators and candle store. Base candles are merged into the open bucket, the last
+    base candle of a bucket closes it and `append` returns the closed row in the same
+    (row, previous_row, timestamp, broken_levels) form the base loader hands on.
+    """
+    def __init__(self, interval, base_interval, history):
+        self.interval = interval
+        self.interval_ms = interval_to_milliseconds(interval)
+        self.step_ms = interval_to_milliseconds(base_interval)
+        if self.interval_ms <= self.step_ms or self.interval_ms % self.step_ms or DAY_MS % self.interval_ms:
+            raise ValueError(f"Cannot aggregate {base_interval} candles into {interval}")
+        self.bars = self.interval_ms // self.step_ms
+
+        aggregated = calculate_indicators(aggregate(history, self.interval_ms, self.step_ms))
+        self.indicators = StreamingIndicators()
+        self.indicators.warmup(aggregated)
+        self.candles = CandleStore(StreamingIndicators.longest_window + RealTimeConfig.candle_store_warmup)
+        self.candles.extend(aggregated)
+
+        # the bucket the history ends in is still open, the stream completes it
+        self.bucket = None
+        self.partial = None
+        self.count = 0
+        open_ms = open_times_ms(history.index)
+        if len(open_ms):
+            last_bucket = open_ms[-1] // self.interval_ms * self.interval_ms
+            if open_ms[-1] + self.step_ms < last_bucket + self.interval_ms:
+                for timestamp, candle in history[open_ms >= last_bucket].iterrows():
+                    self.merge(timestamp, candle)
+
+    @staticmethod
+    def warmup_start_ms(intervals):
+        """Base history start that warms up the indicators of every interval."""
+        longest_ms = max(interval_to_milliseconds(interval) for interval in intervals)
+        return int(time.time() * 1000) - (StreamingIndicators.longest_window + RealTimeConfig.candle_store_warmup) * longest_ms
+
+    @property
+    def historical_data(self):
+        return self.candles.to_frame()
+
+    def merge(self, timestamp, candle):
+        open_ms = pd.Timestamp(timestamp).value // 10 ** 6
+        bucket = open_ms // self.interval_ms * self.interval_ms
+        if bucket != self.bucket:
+            self.bucket, self.count, self.partial = bucket, 0, None
+        self.partial = merge_candle(self.partial, candle)
+        self.count += 1
+        return open_ms + self.step_ms == bucket + self.interval_ms
+
+    def preview(self, timestamp, candle):
+        """Provisional row of the open bucket with the unclosed base candle `candle` in it, nothing is committed."""
+        bucket = pd.Timestamp(timestamp).value // 10 ** 6 // self.interval_ms * self.interval_ms
+        partial = merge_candle(self.partial if bucket == self.bucket else None, candle)
+        return self.indicators.preview(pd.to_datetime(bucket, unit='ms'), partial)
+
+    def append(self, timestamp, candle):
+        if not self.merge(timestamp, candle):
+            return None
+        if self.count != self.bars:
+            log_error(f"Incomplete {self.interval} candle at {pd.to_datetime(self.bucket, unit='ms')}: "
+                      f"{self.count} of {self.bars} base candles, skipped")
+            return None
+
+        timestamp = pd.to_datetime(self.bucket, unit='ms')
+        previous_row = self.candles.row(-1) if len(self.candles) else None
+        row = self.indicators.update(timestamp, self.partial)
+        self.candles.append(timestamp, row)
+        return row, previous_row, timestamp, self.indicators.broken_levels()
@@ -0,0 +1,62 @@
+import json
+import threading
+import time
+
+from config import BacktestConfig, RecorderConfig
+
+HISTORY, KLINE, PRICE = 'h', 'k', 'p'
+
+
+class CandleJournal:
+    """
+    Append-only record of the live market input, one compact JSON array per line:
+        ["h", first_open_ms, last_open_ms, symbol]               history the loader started from
+        ["k", received_ms, open_ms, o, h, l, c, v, symbol]       closed kline
+        ["p", received_ms, price, symbol]                        mark price tick
+    Enough to replay a session through the real handlers with the same indicator state.
+    Journals from before multi-symbol support have no symbol, see `record_symbol`.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', buffering=1)
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':'))
+        with self.lock:
+            self.file.write(line + '\n')
+
+    def record_history(self, first_open_ms, last_open_ms, symbol):
+        self.write([HISTORY, int(first_open_ms), int(last_open_ms), symbol])
+
+    def record_kline(self, kline):
+        self.write([KLINE, int(time.time() * 1000), kline['t'], float(kline['o']), float(kline['h']),
+                    float(kline['l']), float(kline['c']), float(kline['v']), kline['s']])
+
+    def record_price(self, price, symbol):
+        self.write([PRICE, int(time.time() * 1000), price, symbol])
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+RECORD_LENGTHS = {HISTORY: 3, KLINE: 8, PRICE: 3}
+
+
+def record_symbol(record):
+    """Symbol of a journal record, the backtest symbol for records journaled without one."""
+    return record[RECORD_LENGTHS[record[0]]] if len(record) > RECORD_LENGTHS[record[0]] else BacktestConfig.symbol
+
+
+def read_journal(path):
+    with open(path) as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # last line of an interrupted write
+                continue
+
+
+candle_journal = CandleJournal(RecorderConfig.journal_path) if RecorderConfig.journal_path else None
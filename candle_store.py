@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from streaming_indicators import COLUMNS
+
+
+class CandleStore:
+    """
+    Fixed-capacity candle history backed by preallocated float64 arrays.
+
+    Columns are kept column-major in a buffer twice the capacity: rows are written
+    forward and, once the end of the buffer is reached, the live window is moved back
+    to the start. Appends stay amortized O(1) and the live rows are always contiguous,
+    so NumPy columns and the DataFrame returned by `to_frame` are views, not copies.
+    """
+    def __init__(self, capacity, columns=None):
+        if capacity <= 0:
+            raise ValueError("Candle store capacity must be positive")
+
+        self.capacity = capacity
+        self.columns = list(columns or COLUMNS)
+        self.column_index = {column: i for i, column in enumerate(self.columns)}
+        self.data = np.full((len(self.columns), 2 * capacity), np.nan, dtype=np.float64)
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def _compact(self):
+        length = len(self)
+        self.data[:, :length] = self.data[:, self.start:self.end]
+        self.timestamps[:length] = self.timestamps[self.start:self.end]
+        self.start = 0
+        self.end = length
+
+    def append(self, timestamp, values):
+        if self.end == self.data.shape[1]:
+            self._compact()
+
+        position = self.end
+        if isinstance(values, (pd.Series, dict)):
+            for column, i in self.column_index.items():
+                self.data[i, position] = values.get(column, np.nan)
+        else:
+            self.data[:, position] = values
+        self.timestamps[position] = pd.Timestamp(timestamp).value
+
+        self.end += 1
+        if len(self) > self.capacity:
+            self.start += 1
+
+    def extend(self, df):
+        df = df.iloc[-self.capacity:]
+        count = len(df)
+        if self.end + count > self.data.shape[1]:
+            self._compact()
+
+        position = self.end
+        for column, i in self.column_index.items():
+            if column in df:
+                self.data[i, position:position + count] = df[column].to_numpy(dtype=np.float64)
+            else:
+                self.data[i, position:position + count] = np.nan
+        self.timestamps[position:position + count] = df.index.values.astype('datetime64[ns]').view(np.int64)
+
+        self.end += count
+        self.start = max(self.start, self.end - self.capacity)
+
+    def column(self, name):
+        return self.data[self.column_index[name], self.start:self.end]
+
+    def values(self):
+        return self.data[:, self.start:self.end]
+
+    def index(self):
+        return pd.DatetimeIndex(self.timestamps[self.start:self.end].view('datetime64[ns]'))
+
+    def last_timestamp(self):
+        if not len(self):
+            return None
+        return pd.Timestamp(self.timestamps[self.end - 1])
+
+    def row(self, position=-1):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("Candle store row out of range")
+
+        absolute = self.start + position
+        return pd.Series(self.data[:, absolute].copy(), index=self.columns,
+                         name=pd.Timestamp(self.timestamps[absolute]))
+
+    def to_frame(self):
+        # transposed view of the column-major block, pandas keeps it without copying
+        return pd.DataFrame(self.values().T, index=self.index(), columns=self.columns, copy=False)
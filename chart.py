@@ -1,6 +1,5 @@
-import requests
-
 from config import ChartImgConfig
+from http_client import http_client
 from logger_output import log_error
 
 
@@ -19,11 +18,12 @@ def fetch_chart_as_url(api_key, layout_id, session_id, session_sign):
         'tradingview-session-id-sign': session_sign
     }
 
-    response = requests.post(api_url, params=params, headers=headers)
+    response = http_client.post(api_url, endpoint="chart_img", params=params, headers=headers)
     if response.status_code == 200:
         return response.json()['url']
     else:
-        log_error(f"Error fetching chart: {response.status_code}, {response.text}")
+        # the overview source alerts once per outage, this is retried every MarketSourcesConfig.retry_delay
+        log_error(f"Error fetching chart: {response.status_code}, {response.text}", notify=False)
         return None
 
 def fetch_chart():
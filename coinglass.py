@@ -76,7 +76,7 @@ def decrypt_and_clean(t, e):
 
     return decompressed_data
 
-import requests
+from http_client import http_client
 
 url = 'https://capi.coinglass.com/api/index/v2/liqHeatMap'
 params = {
@@ -133,7 +133,7 @@ def generate_encrypted_token():
 if __name__ == "__main__":
     # Пример данных
     params['data'] = generate_encrypted_token()
-    response = requests.get(url, params=params, headers=headers)
+    response = http_client.get(url, endpoint="coinglass_heatmap", params=params, headers=headers)
     if response.status_code == 200:
         encrypted_data = response.json()['data']
     else:
@@ -1,13 +1,45 @@
+import contextlib
 import copy
 import os
+import threading
 
 from database_helper import get_database_helper
 from formatting import format_price
 
 
+class StateVersion:
+    """
+    Counts edits of strategy configs and position states and users or strategies added, so
+    indexes built over them know when to rebuild. Edits a thread makes while `paused` are its
+    own and are not counted.
+    """
+    value = 0
+    local = threading.local()
+
+    @classmethod
+    def bump(cls):
+        if not getattr(cls.local, 'paused', False):
+            cls.value += 1
+
+    @classmethod
+    @contextlib.contextmanager
+    def paused(cls):
+        cls.local.paused = True
+        try:
+            yield
+        finally:
+            cls.local.paused = False
+
+
 class StrategyConfig:
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        StateVersion.bump()
+
     def __init__(self, name=None):
         self.name = name
+        self.symbol = BacktestConfig.symbol
+        self.interval = BacktestConfig.interval
         self.high_volume_only = True
         self.position_size = 100.0
         self.long_buy_rsi_enter = 80
@@ -77,6 +109,9 @@ class StrategyConfig:
     def load(self, row):
         for key, value in row.items():
             setattr(self, key, value)
+        # a market missing from the row is the one every strategy traded before it was configurable
+        self.symbol = self.symbol or BacktestConfig.symbol
+        self.interval = self.interval or BacktestConfig.interval
 
     def store(self, strategy_id):
         data = copy.deepcopy(self.__dict__)
@@ -128,9 +163,79 @@ class BacktestConfig:
     start_date = '1 Dec 2024'
     end_date = '12 Dec 2024' # TODO: CURRENT DATE!!!!!!!!!!!!
 
+class KlineCacheConfig:
+    enabled = True
+    directory = os.getenv("KLINE_CACHE_DIR", "kline_cache")
+
+class KlineDownloadConfig:
+    max_workers = 4
+    weight_per_minute = 1200  # half of the futures limit, the live process shares the key
+    chunk_limit = 1500
+    retries = 5
+    retry_delay = 1.0
+
+class OptimizerConfig:
+    workers = os.cpu_count() or 1
+    batch_size = 32
+    results_path = os.getenv("OPTIMIZER_RESULTS", "optimizer_results.jsonl")
+    walk_forward_train = 30 * 24  # candles
+    walk_forward_test = 7 * 24
+
 class RealTimeConfig:
     notify = True
     first_minute_check = True
+    candle_store_warmup = 100  # rows kept on top of the longest indicator window
+    mark_price_stream = True  # replays drive the price tracker themselves
+    # markets served by one process over combined streams, the overview follows BacktestConfig.symbol
+    symbols = [symbol.strip().upper() for symbol in os.getenv("SYMBOLS", BacktestConfig.symbol).split(',') if symbol.strip()]
+    kline_grace = 30  # seconds past the expected close before a missing kline counts as a gap
+    kline_watchdog_period = 10  # seconds
+    kline_watchdog_max_backoff = 600  # seconds between backfill attempts of a symbol the exchange has no candles for
+    intrabar_exits = False  # exits also on provisional indicators of unclosed klines, entries wait for the close
+    intrabar_throttle = 5.0  # seconds between intrabar exit evaluations of a symbol
+
+class AggregationConfig:
+    # higher timeframes built locally from the BacktestConfig.interval stream, e.g. "4h,1d"
+    timeframes = [interval.strip() for interval in os.getenv("TIMEFRAMES", "").split(',') if interval.strip()]
+
+class HttpConfig:
+    connect_timeout = 3.05  # seconds
+    read_timeout = 10
+    retries = 2
+    retry_delay = 0.5  # doubled per attempt, jittered
+    retry_budget_ratio = 0.1  # retries allowed per request made, across all endpoints
+    retry_budget_max = 10
+    pool_hosts = 10
+    pool_size = 10  # keep-alive connections per host
+
+class MarketSourcesConfig:
+    # seconds, the overview reads the last good value while it is refreshed in the background
+    dominance_ttl = 30 * 60
+    fear_and_greed_ttl = 60 * 60
+    chart_ttl = 10 * 60
+    retry_delay = 60  # after a failed fetch
+    refresh_period = 5
+
+class OverviewConfig:
+    capacity = 5000  # overviews users can page back through
+    path = os.getenv("OVERVIEW_STORE", "overview_store.npz")  # kept across restarts, None keeps them in memory
+    save_period = 60  # seconds, the store is written in the background when it changed
+    page_jump = 24  # overviews skipped by the fast paging buttons
+    warm_start = 48  # overviews rebuilt from the loaded history on start, past the stored ones
+
+class DispatchConfig:
+    workers = 8
+    max_pending = 10000  # queued trade side effects before the live loop waits for the workers
+
+class TraceConfig:
+    path = os.getenv("TRACE_FILE", "traces.jsonl")
+    sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # share of candles traced, 0 disables tracing
+    max_bytes = 10 * 1024 * 1024
+    backups = 5
+
+class RecorderConfig:
+    journal_path = os.getenv("CANDLE_JOURNAL")  # live klines and mark prices are journaled when set
+    replay_speed = 60.0  # 0 replays as fast as possible
 
 
 class ConnectionsConfig:
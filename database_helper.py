@@ -4,6 +4,8 @@ from threading import Lock
 
 from supabase import create_client, Client
 
+from tracing import traced
+
 class DatabaseConfig:
     store_to_db = True
 
@@ -27,6 +29,7 @@ class DatabaseHelper:
                 # You can manage schema through Supabase dashboard or migration scripts.
 
     @staticmethod
+    @traced("db_store")
     def store(table: str, data: dict):
         if not DatabaseConfig.store_to_db:
             # log("DB is disabled, skipping update")
@@ -67,6 +70,8 @@ def get_database_helper():
     global _db_helper_instance
     if _db_helper_instance is None:
         _db_helper_instance = DatabaseHelper()
-        _db_helper_instance.initialize(DatabaseConfig.SUPABASE_URL, DatabaseConfig.SUPABASE_KEY)
+        # offline runs (replays) have no credentials and keep store_to_db off
+        if DatabaseConfig.SUPABASE_URL:
+            _db_helper_instance.initialize(DatabaseConfig.SUPABASE_URL, DatabaseConfig.SUPABASE_KEY)
 
     return _db_helper_instance
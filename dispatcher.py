@@ -0,0 +1,75 @@
+import contextvars
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DispatchConfig
+from logger_output import log_error
+from metrics import metrics
+
+
+class UserDispatcher:
+    """
+    Runs per-user side effects (orders, database writes, Telegram messages) on a worker pool.
+    Tasks of one user run one at a time in submission order, different users run in parallel.
+    At most `max_pending` tasks wait at once, `submit` blocks beyond that so a stalled
+    downstream slows the producer down instead of growing memory without bound.
+    """
+    def __init__(self, workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dispatch")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.queues = {}
+        self.pending = 0
+
+    def submit(self, user_id, task):
+        self.slots.acquire()
+        # the task runs in the submitter's context, traces continue on the worker
+        context = contextvars.copy_context()
+        with self.lock:
+            self.pending += 1
+            queue = self.queues.get(user_id)
+            if queue is not None:
+                # a drain for this user is running and picks the task up in order
+                queue.append((task, context, time.perf_counter()))
+                return
+            self.queues[user_id] = deque([(task, context, time.perf_counter())])
+        self.executor.submit(self.drain, user_id)
+
+    def drain(self, user_id):
+        while True:
+            with self.lock:
+                queue = self.queues[user_id]
+                task, context, submitted = queue[0]
+
+            metrics.observe("dispatch_wait", time.perf_counter() - submitted)
+            try:
+                context.run(task)
+            except Exception as e:
+                metrics.error("dispatch")
+                log_error(f"Dispatched task failed for user {user_id}: {e}\n"
+                          f"{traceback.format_exc()}")
+            finally:
+                self.slots.release()
+
+            with self.lock:
+                queue.popleft()
+                self.pending -= 1
+                if not self.pending:
+                    self.idle.notify_all()
+                if not queue:
+                    del self.queues[user_id]
+                    return
+
+    def flush(self, timeout=None):
+        """Waits until every submitted task has run, returns False on timeout."""
+        with self.lock:
+            return self.idle.wait_for(lambda: not self.pending, timeout)
+
+
+trade_dispatcher = UserDispatcher(DispatchConfig.workers, DispatchConfig.max_pending)
+metrics.gauge("dispatch_pending", lambda: trade_dispatcher.pending)
+metrics.gauge("dispatch_users", lambda: len(trade_dispatcher.queues))
@@ -2,15 +2,35 @@ import http.server
 import os
 import socketserver
 
+from metrics import metrics
+
 # Получаем порт из переменной окружения, требуется Render
 PORT = int(os.getenv("PORT", 8080))
 
 class MinimalHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
+        if self.path == "/metrics":
+            self.respond(metrics.prometheus(), "text/plain; version=0.0.4")
+        elif self.path == "/status":
+            self.respond(metrics.status(), "application/json")
+        else:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"OK")  # Ответ "OK" на любой запрос
+
+    def respond(self, body, content_type):
+        body = body.encode()
         self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(b"OK")  # Ответ "OK" на любой запрос
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # health checks and scrapes would flood the log
+        pass
 
 def run_web_server():
-    with socketserver.TCPServer(("", PORT), MinimalHandler) as httpd:
-        httpd.serve_forever()
\ No newline at end of file
+    # threaded, a slow scrape must not hold up the health check
+    with socketserver.ThreadingTCPServer(("", PORT), MinimalHandler) as httpd:
+        httpd.serve_forever()
@@ -1,39 +1,112 @@
+import functools
 import threading
+import time
 import traceback
 
 import pandas as pd
 from binance import Client, ThreadedWebsocketManager
+from binance.helpers import date_to_milliseconds, interval_to_milliseconds
 
-from config import ConnectionsConfig, BacktestConfig
+from candle_aggregator import CandleAggregator
+from candle_journal import candle_journal
+from candle_store import CandleStore
+from config import ConnectionsConfig, BacktestConfig, RealTimeConfig, KlineCacheConfig, AggregationConfig, HttpConfig
 from indicators import calculate_indicators
+from kline_cache import kline_cache
+from kline_downloader import KlineDownloader
 from logger_output import log, log_error
+from metrics import metrics
+from tracing import tracer, traced
+from streaming_indicators import StreamingIndicators
 
 client = Client(ConnectionsConfig.TESTNET_API_KEY if BacktestConfig.testnet_md else ConnectionsConfig.API_KEY,
                 ConnectionsConfig.TESTNET_API_SECRET if BacktestConfig.testnet_md else ConnectionsConfig.API_SECRET,
-                testnet=BacktestConfig.testnet_md)
+                testnet=BacktestConfig.testnet_md,
+                requests_params={'timeout': (HttpConfig.connect_timeout, HttpConfig.read_timeout)})
+kline_downloader = KlineDownloader(client)
 
 
 class HistoricalDataLoader:
-    def __init__(self, handler_callback=None, backload=True, forward_load=True):
-        self.historical_data = self.get_historical_data(BacktestConfig.symbol, BacktestConfig.interval,
-                                                        BacktestConfig.lookback_period if backload else BacktestConfig.start_date,
-                                                        "now")
-        self.historical_data = calculate_indicators(self.historical_data)
-        log(f"History loaded / {BacktestConfig.interval} ({BacktestConfig.lookback_period})")
+    """
+    Candles and incremental indicators of one symbol. Live loaders (`forward_load`) get their
+    klines from a KlineStream, their own unless `subscribe` is off and a shared one feeds them.
+    Higher `timeframes` are aggregated from the same klines, their closed candles are handed
+    on as `handler_callback(update, interval=...)`.
+    """
+    def __init__(self, handler_callback=None, backload=True, forward_load=True, history=None, symbol=None,
+                 subscribe=True, timeframes=None):
+        self.symbol = symbol or BacktestConfig.symbol
+        timeframes = AggregationConfig.timeframes if timeframes is None else timeframes
+        if history is None:
+            start_ms = date_to_milliseconds(BacktestConfig.lookback_period if backload else BacktestConfig.start_date)
+            if timeframes and forward_load:
+                # one longer live base history warms up the higher timeframes as well, backtests keep their range
+                start_ms = min(start_ms, CandleAggregator.warmup_start_ms(timeframes))
+            history = self.get_historical_range(self.symbol, BacktestConfig.interval, start_ms,
+                                                date_to_milliseconds("now"))
+        self.aggregators = [CandleAggregator(interval, BacktestConfig.interval, history) for interval in timeframes]
+        history = calculate_indicators(history)
+        self.indicators = StreamingIndicators()
+        self.indicators.warmup(history)
 
+        # live process only needs the indicator windows, backtests walk the whole range
+        capacity = StreamingIndicators.longest_window + RealTimeConfig.candle_store_warmup \
+            if forward_load else max(1, len(history))
+        self.candles = CandleStore(capacity)
+        self.candles.extend(history)
+        log(f"History loaded / {self.symbol} {BacktestConfig.interval} ({BacktestConfig.lookback_period})")
+
+        self.handler_callback = handler_callback
+        self.step_ms = interval_to_milliseconds(BacktestConfig.interval)
+        # the socket and the watchdog both feed candles, a KlineStream shares one lock over its loaders
+        self.lock = threading.RLock()
+        # replays feed the journal as it was, gaps included
+        self.backfill_gaps = forward_load
+        self.intrabar_evaluated = 0.0
+        self.stream = None
         if forward_load:
-            self.twm = None
-            self.handler_callback = handler_callback
-            self.ws_thread = threading.Thread(target=self.run_websocket, daemon=True)
-            self.ws_thread.start()
+            if candle_journal:
+                candle_journal.record_history(history.index[0].value // 10 ** 6, history.index[-1].value // 10 ** 6,
+                                              self.symbol)
+            if subscribe:
+                self.stream = KlineStream([self])
 
-            log("Kline socket is started")
+    @property
+    def historical_data(self):
+        return self.candles.to_frame()
 
-    def run_websocket(self):
-        self.twm = ThreadedWebsocketManager()
-        self.twm.start()
-        self.twm.start_kline_futures_socket(callback=self.handle_kline, symbol=BacktestConfig.symbol,
-                                            interval=BacktestConfig.interval)
+    def last_open_ms(self):
+        return self.candles.last_timestamp().value // 10 ** 6
+
+    def overdue(self, now_ms):
+        # the candle after the last one closes two steps after the last open
+        return now_ms > self.last_open_ms() + 2 * self.step_ms + RealTimeConfig.kline_grace * 1000
+
+    def backfill(self, end_ms=None, notify_last=True):
+        """
+        Fetches the closed candles after the last one up to `end_ms` (open time, default the
+        last closed candle) in one REST batch and feeds them in order through the incremental
+        indicators. Only the newest is passed on to the handler, older ones are stale signals.
+        """
+        with self.lock:
+            start_ms = self.last_open_ms() + self.step_ms
+            if end_ms is None:
+                end_ms = (int(time.time() * 1000) // self.step_ms - 1) * self.step_ms
+            if end_ms < start_ms:
+                return 0
+
+            with metrics.timer("backfill"):
+                candles = kline_downloader.download(self.symbol, BacktestConfig.interval,
+                                                    [(start_ms, end_ms)], self.step_ms)
+            count = len(candles['open_time'])
+            for i in range(count):
+                kline = {'t': int(candles['open_time'][i]), 's': self.symbol, 'x': True,
+                         'o': candles['open'][i], 'h': candles['high'][i], 'l': candles['low'][i],
+                         'c': candles['close'][i], 'v': candles['volume'][i]}
+                self.process_kline(kline, notify=notify_last and i == count - 1)
+
+            log(f"Backfilled {count} {self.symbol} candles up to {pd.to_datetime(end_ms, unit='ms')}", notify=count > 0)
+            return count
 
     def format_data(self, df):
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -47,15 +120,26 @@ class HistoricalDataLoader:
         return df
 
     def get_historical_data(self, symbol, interval, start_date, end_date):
-        klines = client.futures_historical_klines(symbol, interval, start_date, end_date)
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time',
-            'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume',
-            'taker_buy_quote_asset_volume', 'ignore'])
+        return self.get_historical_range(symbol, interval, date_to_milliseconds(start_date),
+                                         date_to_milliseconds(end_date))
+
+    @staticmethod
+    def get_historical_range(symbol, interval, start_ms, end_ms):
+        step_ms = interval_to_milliseconds(interval)
 
-        df = self.format_data(df)
+        def fetch(ranges):
+            return kline_downloader.download(symbol, interval, ranges, step_ms)
 
-        return df[['close', 'high', 'low', 'open', 'volume']]
+        if KlineCacheConfig.enabled:
+            candles = kline_cache.get(symbol, interval, start_ms, end_ms, step_ms, fetch)
+        else:
+            candles = fetch([(start_ms, end_ms)])
+
+        df = pd.DataFrame({column: candles[column] for column in ['close', 'high', 'low', 'open', 'volume']},
+                          index=pd.to_datetime(candles['open_time'], unit='ms'))
+        df.index.name = 'timestamp'
+
+        return df
 
     # def get_last(self):
     #     # Получить последнюю свечу с сервера
@@ -80,23 +164,23 @@ class HistoricalDataLoader:
     #                   f"{traceback.format_exc()}")
     #         return None
 
+    @traced("append_candle")
     def append_candle(self, new_data):
-        if new_data.index[-1] > self.historical_data.index[-1]:
-            previous_row = self.historical_data.iloc[-1]
-            self.historical_data = pd.concat([self.historical_data, new_data])
-            self.historical_data = calculate_indicators(self.historical_data)
-            row = self.historical_data.iloc[-1]
+        if new_data.index[-1] > self.candles.last_timestamp():
+            previous_row = self.candles.row(-1)
             timestamp = new_data.index[-1]
-            return row, previous_row, timestamp
+            with metrics.timer("indicators"):
+                row = self.indicators.update(timestamp, new_data.iloc[-1])
+            self.candles.append(timestamp, row)
+            return row, previous_row, timestamp, self.indicators.broken_levels()
 
         return None
 
-    def handle_kline(self, msg):
-        try:
-            kline = msg['k']
-            if not kline['x']:
-                return
+    def process_kline(self, kline, notify=True):
+        if candle_journal:
+            candle_journal.record_kline(kline)
 
+        with tracer.trace("candle", symbol=self.symbol, open_time=kline['t']):
             new_data = pd.DataFrame([{
                 'timestamp': kline['t'],
                 'open': float(kline['o']),
@@ -110,8 +194,166 @@ class HistoricalDataLoader:
             append_result = self.append_candle(new_data)
             if not append_result:
                 log_error("Empty kline append result!")
-            else:
+                return
+            if notify:
                 self.handler_callback(append_result)
+
+            row, _, timestamp, _ = append_result
+            for aggregator in self.aggregators:
+                update = aggregator.append(timestamp, row)
+                if update and notify:
+                    self.handler_callback(update, interval=aggregator.interval)
+
+    def process_intrabar(self, kline):
+        """
+        Provisional rows of the unclosed kline, and of the open higher timeframe candles, go to
+        `handler_callback(update, intrabar=True)` at most once per throttle period. Nothing is
+        committed, the closed kline updates the indicators as usual.
+        """
+        now = time.monotonic()
+        if now - self.intrabar_evaluated < RealTimeConfig.intrabar_throttle:
+            return
+        with self.lock:
+            # the candle right after the last closed one, after a gap the provisional values would be off
+            if kline['t'] != self.last_open_ms() + self.step_ms:
+                return
+            self.intrabar_evaluated = now
+
+            timestamp = pd.to_datetime(kline['t'], unit='ms')
+            candle = {'open': float(kline['o']), 'high': float(kline['h']), 'low': float(kline['l']),
+                      'close': float(kline['c']), 'volume': float(kline['v'])}
+            with tracer.trace("intrabar", symbol=self.symbol, open_time=kline['t']), metrics.timer("intrabar"):
+                row = self.indicators.preview(timestamp, candle)
+                self.handler_callback((row, self.candles.row(-1), timestamp, {}), intrabar=True)
+                for aggregator in self.aggregators:
+                    row = aggregator.preview(timestamp, candle)
+                    previous_row = aggregator.candles.row(-1) if len(aggregator.candles) else None
+                    self.handler_callback((row, previous_row, row.name, {}),
+                                          interval=aggregator.interval, intrabar=True)
+
+    def handle_kline(self, msg):
+        try:
+            kline = msg['k']
+            if not kline['x']:
+                if RealTimeConfig.intrabar_exits:
+                    self.process_intrabar(kline)
+                return
+            if 'E' in msg:
+                # exchange event time to arrival here, socket and thread handoff delay
+                metrics.observe("kline_receipt", max(0.0, time.time() - msg['E'] / 1000))
+            started = time.perf_counter()
+
+            with self.lock:
+                if self.backfill_gaps and kline['t'] > self.last_open_ms() + self.step_ms:
+                    # the socket skipped candles, the indicators must not run over the hole
+                    metrics.error("kline_gap")
+                    self.backfill(kline['t'] - self.step_ms, notify_last=False)
+                self.process_kline(kline)
+            metrics.observe("candle", time.perf_counter() - started)
         except Exception as candle_exception:
+            metrics.error("kline")
             log_error(f"Failed to process socket k-line: {candle_exception}\n"
-                      f"{traceback.format_exc()}")
\ No newline at end of file
+                      f"{traceback.format_exc()}")
+
+class KlineStream:
+    """
+    Closed klines of many loaders over one combined websocket, routed by symbol. A dropped
+    socket delivers nothing, so silence is the only signal: once the next candle of a symbol
+    is overdue by the grace period, its missing candles are backfilled over REST, and the
+    socket is resubscribed only if the exchange had candles it did not deliver. A symbol the
+    exchange has nothing for (outage, delisting) is retried with a growing backoff, alerted
+    once when it stalls and once when it recovers.
+    """
+    def __init__(self, loaders):
+        self.loaders = {loader.symbol: loader for loader in loaders}
+        # one candle at a time across symbols, trade logic swaps the market state per symbol
+        self.lock = threading.RLock()
+        for loader in loaders:
+            loader.lock = self.lock
+        self.streams = [f"{symbol.lower()}@kline_{BacktestConfig.interval}" for symbol in self.loaders]
+        self.stalled = {}  # symbol: (next backfill attempt, backoff seconds)
+
+        self.twm = None
+        self.ws_thread = threading.Thread(target=self.run_websocket, daemon=True)
+        self.ws_thread.start()
+        self.watchdog_thread = threading.Thread(target=self.run_watchdog, daemon=True)
+        self.watchdog_thread.start()
+
+        log(f"Kline socket is started / {', '.join(self.loaders)}")
+
+    def run_websocket(self):
+        self.twm = ThreadedWebsocketManager()
+        self.twm.start()
+        self.twm.start_futures_multiplex_socket(callback=self.handle_message, streams=self.streams)
+
+    def handle_message(self, msg):
+        data = msg.get('data', msg)
+        loader = self.loaders.get(data.get('s'))
+        if loader is None or 'k' not in data:
+            if data.get('e') == 'error':
+                log_error(f"Kline socket error: {data.get('m')}")
+            return
+        loader.handle_kline(data)
+
+    def resubscribe(self):
+        twm, self.twm = self.twm, None
+        if twm is not None:
+            try:
+                twm.stop()
+            except Exception as stop_exception:
+                log_error(f"Failed to stop kline socket: {stop_exception}")
+        self.run_websocket()
+        log("Kline socket is resubscribed")
+
+    def check_stalled(self, now):
+        missing = False
+        for symbol, loader in self.loaders.items():
+            if not loader.overdue(now * 1000):
+                if self.stalled.pop(symbol, None):
+                    log(f"Klines of {symbol} are flowing again")
+                continue
+
+            retry_at, backoff = self.stalled.get(symbol, (0.0, 0))
+            if now < retry_at:
+                continue
+            metrics.error("kline_stalled")
+            if not backoff:
+                log_error(f"No closed kline for {symbol}, backfilling")
+            try:
+                # candles the exchange has but the socket did not deliver, the socket is the one to blame
+                missing = loader.backfill() > 0 or missing
+            except Exception as backfill_exception:
+                metrics.error("backfill")
+                log_error(f"Backfill of {symbol} failed: {backfill_exception}", notify=not backoff)
+            backoff = min(max(2 * backoff, RealTimeConfig.kline_watchdog_period), RealTimeConfig.kline_watchdog_max_backoff)
+            self.stalled[symbol] = (now + backoff, backoff)
+
+        if missing:
+            self.resubscribe()
+
+    def run_watchdog(self):
+        while True:
+            time.sleep(RealTimeConfig.kline_watchdog_period)
+            try:
+                self.check_stalled(time.time())
+            except Exception as watchdog_exception:
+                metrics.error("watchdog")
+                log_error(f"Kline watchdog failed: {watchdog_exception}\n"
+                          f"{traceback.format_exc()}")
+
+
+def load_symbols(symbols, handler_callback):
+    """
+    Live loaders of `symbols` on one shared KlineStream, `handler_callback(update, symbol)`.
+    Symbols that fail to load are logged and left out.
+    """
+    loaders = []
+    for symbol in symbols:
+        try:
+            loaders.append(HistoricalDataLoader(handler_callback=functools.partial(handler_callback, symbol=symbol),
+                                                symbol=symbol, subscribe=False))
+        except Exception:
+            log_error(f"Failed to load {symbol} history!\n"
+                      f"{traceback.format_exc()}")
+    stream = KlineStream(loaders) if loaders else None
+    return loaders, stream
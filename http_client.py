@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HttpConfig
+from logger_output import log_error
+from metrics import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Retries allowed across all endpoints: every request deposits `ratio` of a token, every
+    retry takes a whole one. When a provider is down, retries stay a fraction of the traffic
+    instead of multiplying it.
+    """
+    def __init__(self, ratio, maximum):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = maximum
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class HttpClient:
+    """
+    One session for all outbound HTTP calls: keep-alive connection pools per host, connect and
+    read timeouts on every request, jittered retries of connection errors and 429/5xx answers
+    under a shared retry budget, and latency histograms per endpoint (`http_<endpoint>` stages).
+    Responses are returned as they are, status handling stays with the caller.
+    """
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HttpConfig.pool_hosts, pool_maxsize=HttpConfig.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.budget = RetryBudget(HttpConfig.retry_budget_ratio, HttpConfig.retry_budget_max)
+
+    def request(self, method, url, endpoint=None, retries=None, **kwargs):
+        endpoint = endpoint or urlsplit(url).hostname
+        retries = HttpConfig.retries if retries is None else retries
+        kwargs.setdefault('timeout', (HttpConfig.connect_timeout, HttpConfig.read_timeout))
+        self.budget.deposit()
+
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as request_exception:
+                metrics.error(f"http_{endpoint}")
+                if attempt == retries or not self.budget.withdraw():
+                    raise
+                failure = request_exception
+            else:
+                metrics.observe(f"http_{endpoint}", time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                metrics.error(f"http_{endpoint}")
+                if attempt == retries or not self.budget.withdraw():
+                    return response
+                failure = f"status {response.status_code}"
+
+            delay = HttpConfig.retry_delay * (2 ** attempt) * (0.5 + random.random())
+            log_error(f"{method} {endpoint} failed ({failure}), retry in {delay:.1f}s", notify=False)
+            time.sleep(delay)
+
+    def get(self, url, endpoint=None, **kwargs):
+        return self.request('GET', url, endpoint, **kwargs)
+
+    def post(self, url, endpoint=None, **kwargs):
+        return self.request('POST', url, endpoint, **kwargs)
+
+
+http_client = HttpClient()
@@ -0,0 +1,126 @@
+import numpy as np
+
+
+def _as_windows(windows):
+    windows = np.asarray(list(windows), dtype=np.int64)
+    if windows.ndim != 1 or not len(windows) or (windows <= 0).any():
+        raise ValueError("Windows must be a non-empty list of positive lengths")
+    return windows
+
+
+def _warmup_mask(windows, length):
+    # rows are windows, columns are candles: value is defined from candle `window - 1`
+    return np.arange(length)[np.newaxis, :] < (windows[:, np.newaxis] - 1)
+
+
+def _exponential_smoothing(inputs, alphas):
+    """
+    Runs state += alpha * (input - state) for every row of `inputs` (rows x time) at once,
+    seeded with the first input like pandas ewm(adjust=False). One pass over the time axis.
+    """
+    series = np.ascontiguousarray(inputs.T)
+    output = np.empty_like(series)
+    state = series[0].copy()
+    output[0] = state
+    for t in range(1, len(series)):
+        state += alphas * (series[t] - state)
+        output[t] = state
+
+    return np.ascontiguousarray(output.T)
+
+
+def _rolling_extremum(values, windows, function):
+    """
+    Sparse table of power-of-two block extrema, shared by all windows: each window
+    then takes the extremum of two overlapping blocks, O(n) per window.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    length = len(values)
+    result = np.full((len(windows), length), np.nan)
+
+    levels = [values]
+    while (1 << len(levels)) <= min(windows.max(), length):
+        previous = levels[-1]
+        shift = 1 << (len(levels) - 1)
+        levels.append(function(previous[:-shift], previous[shift:]))
+
+    for row, window in enumerate(windows):
+        if window > length:
+            continue
+        level = int(window).bit_length() - 1
+        block = levels[level]
+        block_size = 1 << level
+        starts = np.arange(length - window + 1)
+        result[row, window - 1:] = function(block[starts], block[starts + window - block_size])
+
+    return result
+
+
+def ema_matrix(prices, windows):
+    """EMA for every window (windows x time), same values as ta.trend.ema_indicator."""
+    return indicator_family(prices, None, None, ema_windows=_as_windows(windows))['EMA']
+
+
+def rsi_matrix(prices, windows):
+    """Wilder RSI for every window (windows x time), same values as ta.momentum.rsi."""
+    return indicator_family(prices, None, None, rsi_windows=_as_windows(windows))['RSI']
+
+
+def rolling_min_matrix(values, windows):
+    return _rolling_extremum(values, _as_windows(windows), np.minimum)
+
+
+def rolling_max_matrix(values, windows):
+    return _rolling_extremum(values, _as_windows(windows), np.maximum)
+
+
+def indicator_family(close, high, low, ema_windows=(), rsi_windows=(), support_windows=(), resistance_windows=()):
+    """
+    Computes a batch of indicator configurations over contiguous price arrays.
+    EMA and RSI recurrences for all windows share a single pass over the series.
+    Returns {'EMA': matrix, 'RSI': matrix, 'Support': matrix, 'Resistance': matrix}
+    for the families that were requested, each shaped windows x time.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    length = len(close)
+    result = {}
+
+    ema_windows = np.asarray(list(ema_windows), dtype=np.int64)
+    rsi_windows = np.asarray(list(rsi_windows), dtype=np.int64)
+    if not length:
+        # no candles: every requested family is an empty windows x 0 matrix
+        for family, windows in (('EMA', ema_windows), ('RSI', rsi_windows),
+                                ('Support', support_windows), ('Resistance', resistance_windows)):
+            if len(windows):
+                result[family] = np.empty((len(windows), 0))
+        return result
+
+    if len(ema_windows) or len(rsi_windows):
+        diff = np.diff(close, prepend=close[0])
+        ema_count, rsi_count = len(ema_windows), len(rsi_windows)
+
+        inputs = np.empty((ema_count + 2 * rsi_count, length))
+        inputs[:ema_count] = close
+        inputs[ema_count:ema_count + rsi_count] = np.where(diff > 0, diff, 0.0)
+        inputs[ema_count + rsi_count:] = np.where(diff < 0, -diff, 0.0)
+        alphas = np.concatenate([2.0 / (ema_windows + 1), 1.0 / rsi_windows, 1.0 / rsi_windows])
+        smoothed = _exponential_smoothing(inputs, alphas)
+
+        if ema_count:
+            ema = smoothed[:ema_count]
+            ema[_warmup_mask(_as_windows(ema_windows), length)] = np.nan
+            result['EMA'] = ema
+        if rsi_count:
+            average_up = smoothed[ema_count:ema_count + rsi_count]
+            average_down = smoothed[ema_count + rsi_count:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = np.where(average_down == 0, 100.0, 100 - 100 / (1 + average_up / average_down))
+            rsi[_warmup_mask(_as_windows(rsi_windows), length)] = np.nan
+            result['RSI'] = rsi
+
+    if len(support_windows):
+        result['Support'] = rolling_min_matrix(low, support_windows)
+    if len(resistance_windows):
+        result['Resistance'] = rolling_max_matrix(high, resistance_windows)
+
+    return result
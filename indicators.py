@@ -1,5 +1,4 @@
 import ta
-import requests
 
 from logger_output import log_error
 
@@ -42,6 +41,7 @@ def calculate_indicators(df):
 
 
 from config import CoinmarketCapConfig
+from http_client import http_client
 
 def get_btc_dominance():
     URL = 'https://pro-api.coinmarketcap.com/v1/global-metrics/quotes/latest'
@@ -49,15 +49,16 @@ def get_btc_dominance():
         'Accepts': 'application/json',
         'X-CMC_PRO_API_KEY': CoinmarketCapConfig.API_KEY,
     }
-    response = requests.get(URL, headers=headers)
+    response = http_client.get(URL, endpoint="cmc_global_metrics", headers=headers)
     if response.status_code == 200:
         data = response.json()
         btc_dominance = data['data']['btc_dominance']
         btc_dominance_yesterday = data['data']['btc_dominance_yesterday']
         return round(btc_dominance, 1), round(btc_dominance_yesterday, 1)
     else:
+        # the overview source alerts once per outage, this is retried every MarketSourcesConfig.retry_delay
         log_error("Failed to obtain btc dominance from coinmarketcap, response:\n"
-                  f"{response.json()}")
+                  f"{response.text}", notify=False)
         return 0, 0
 
 
@@ -70,7 +71,7 @@ def get_fear_and_greed_index():
         'Accepts': 'application/json',
         'X-CMC_PRO_API_KEY': CoinmarketCapConfig.API_KEY,
     }
-    response = requests.get(URL, headers=headers, params=params)
+    response = http_client.get(URL, endpoint="cmc_fear_and_greed", headers=headers, params=params)
     if response.status_code == 200:
         data = response.json()
         latest_entry = data['data'][0]  # Последняя запись
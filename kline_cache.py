@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from config import KlineCacheConfig
+from logger_output import log
+
+KLINE_FIELDS = ['open_time', 'open', 'high', 'low', 'close', 'volume']
+
+
+def parse_klines(klines):
+    """Raw exchange kline lists straight into typed column arrays (int64 open time, float64 OHLCV)."""
+    count = len(klines)
+    arrays = {'open_time': np.fromiter((kline[0] for kline in klines), dtype=np.int64, count=count)}
+    values = np.asarray([kline[1:6] for kline in klines], dtype=np.float64).reshape(count, 5)
+    for i, field in enumerate(KLINE_FIELDS[1:]):
+        arrays[field] = np.ascontiguousarray(values[:, i])
+    return arrays
+
+
+def concatenate_arrays(chunks):
+    if not chunks:
+        return parse_klines([])
+    return {field: np.concatenate([chunk[field] for chunk in chunks]) for field in KLINE_FIELDS}
+
+
+def missing_ranges(open_times, first, last, step):
+    """Inclusive open-time ranges in [first, last] that are not present in sorted `open_times`."""
+    if first > last:
+        return []
+    open_times = open_times[(open_times >= first) & (open_times <= last)]
+    if not len(open_times):
+        return [(first, last)]
+
+    ranges = []
+    if open_times[0] > first:
+        ranges.append((first, int(open_times[0]) - step))
+    for i in np.nonzero(np.diff(open_times) > step)[0]:
+        ranges.append((int(open_times[i]) + step, int(open_times[i + 1]) - step))
+    if open_times[-1] < last:
+        ranges.append((int(open_times[-1]) + step, last))
+
+    return ranges
+
+
+class KlineCache:
+    """
+    On-disk store of closed klines, one .npz file of column arrays per (symbol, interval).
+    Requests read the cached range and only go to the exchange for the head, tail or
+    gaps that are missing; the merged result is written back atomically.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def path(self, symbol, interval):
+        return os.path.join(self.directory, f"{symbol.upper()}_{interval}.npz")
+
+    def load(self, symbol, interval):
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return parse_klines([]), np.empty((0, 2), dtype=np.int64)
+
+        with np.load(path) as data:
+            return {field: data[field] for field in KLINE_FIELDS}, data['holes']
+
+    def store(self, symbol, interval, arrays, holes):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(symbol, interval)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, holes=holes, **arrays)
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def merge(cached, fetched):
+        merged = {field: np.concatenate([cached[field], fetched[field]]) for field in KLINE_FIELDS}
+        # fetched rows come last, keep them when the same candle is present twice
+        reversed_times = merged['open_time'][::-1]
+        _, unique_index = np.unique(reversed_times, return_index=True)
+        order = len(reversed_times) - 1 - unique_index
+        return {field: values[order] for field, values in merged.items()}
+
+    def get(self, symbol, interval, start_ms, end_ms, step_ms, fetch):
+        """
+        Closed klines with open time in [start_ms, end_ms].
+        `fetch(ranges)` returns kline arrays for a list of inclusive open-time ranges.
+        """
+        last_closed = (int(time.time() * 1000) // step_ms) * step_ms - step_ms
+        first = -(-start_ms // step_ms) * step_ms
+        last = min((end_ms // step_ms) * step_ms, last_closed)
+
+        with self.lock:
+            cached, holes = self.load(symbol, interval)
+            # candles the exchange itself does not have (maintenance) are not requested again
+            ranges = [(range_start, range_end) for range_start, range_end
+                      in missing_ranges(cached['open_time'], first, last, step_ms)
+                      if not ((holes[:, 0] <= range_start) & (holes[:, 1] >= range_end)).any()]
+
+            if ranges:
+                fetched = fetch(ranges)
+                inside = (fetched['open_time'] >= first) & (fetched['open_time'] <= last)
+                fetched = {field: values[inside] for field, values in fetched.items()}
+                cached = self.merge(cached, fetched)
+                # whatever is still missing inside the fetched ranges is confirmed empty
+                new_holes = [hole for range_start, range_end in ranges
+                             for hole in missing_ranges(cached['open_time'], range_start, range_end, step_ms)]
+                if new_holes:
+                    holes = np.concatenate([holes, np.asarray(new_holes, dtype=np.int64)])
+                self.store(symbol, interval, cached, holes)
+                log(f"Kline cache {symbol} {interval}: fetched {len(fetched['open_time'])} candles in {len(ranges)} ranges")
+
+        selected = (cached['open_time'] >= first) & (cached['open_time'] <= last)
+        return {field: values[selected] for field, values in cached.items()}
+
+
+kline_cache = KlineCache(KlineCacheConfig.directory)
@@ -0,0 +1,123 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import KlineCacheConfig, KlineDownloadConfig
+from kline_cache import KLINE_FIELDS, parse_klines, concatenate_arrays
+from logger_output import log_error
+
+
+def klines_request_weight(limit):
+    # futures /fapi/v1/klines weight by limit
+    if limit < 100:
+        return 1
+    elif limit < 500:
+        return 2
+    elif limit <= 1000:
+        return 5
+    return 10
+
+
+class RequestWeightBudget:
+    """Token bucket over exchange request weight, refilled continuously per minute."""
+    def __init__(self, weight_per_minute):
+        self.weight_per_minute = weight_per_minute
+        self.available = float(weight_per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, weight):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(self.weight_per_minute,
+                                     self.available + (now - self.updated) * self.weight_per_minute / 60.0)
+                self.updated = now
+                if self.available >= weight:
+                    self.available -= weight
+                    return
+                wait = (weight - self.available) * 60.0 / self.weight_per_minute
+            time.sleep(wait)
+
+
+class KlineDownloader:
+    """
+    Splits open-time ranges into exchange-sized chunks on a fixed grid and downloads them
+    concurrently under a shared request-weight budget. Every finished chunk is saved as a
+    part file, so an interrupted download resumes with only the chunks that are left.
+    """
+    def __init__(self, client, max_workers=None, weight_per_minute=None, chunk_limit=None, retries=None,
+                 directory=None):
+        self.client = client
+        self.max_workers = max_workers or KlineDownloadConfig.max_workers
+        self.budget = RequestWeightBudget(weight_per_minute or KlineDownloadConfig.weight_per_minute)
+        self.chunk_limit = chunk_limit or KlineDownloadConfig.chunk_limit
+        self.retries = KlineDownloadConfig.retries if retries is None else retries
+        self.directory = directory or os.path.join(KlineCacheConfig.directory, 'parts')
+
+    def chunks(self, ranges, step_ms):
+        chunk_ms = self.chunk_limit * step_ms
+        chunks = []
+        for range_start, range_end in ranges:
+            chunk_start = range_start // chunk_ms * chunk_ms
+            while chunk_start <= range_end:
+                chunks.append((max(chunk_start, range_start), min(chunk_start + chunk_ms - step_ms, range_end)))
+                chunk_start += chunk_ms
+        return chunks
+
+    def part_path(self, symbol, interval, chunk):
+        return os.path.join(self.directory, f"{symbol.upper()}_{interval}", f"{chunk[0]}_{chunk[1]}.npz")
+
+    def load_part(self, path):
+        with np.load(path) as data:
+            return {field: data[field] for field in KLINE_FIELDS}
+
+    def store_part(self, path, arrays):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temporary_path, path)
+
+    def fetch_chunk(self, symbol, interval, chunk):
+        weight = klines_request_weight(self.chunk_limit)
+        for attempt in range(self.retries + 1):
+            self.budget.acquire(weight)
+            try:
+                klines = self.client.futures_klines(symbol=symbol, interval=interval, startTime=chunk[0],
+                                                    endTime=chunk[1], limit=self.chunk_limit)
+                return parse_klines(klines)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = KlineDownloadConfig.retry_delay * (2 ** attempt) * (0.5 + random.random())
+                log_error(f"Kline chunk {symbol} {interval} {chunk} failed ({e}), retry in {delay:.1f}s", notify=False)
+                time.sleep(delay)
+
+    def download_chunk(self, symbol, interval, chunk):
+        path = self.part_path(symbol, interval, chunk)
+        if os.path.exists(path):
+            return self.load_part(path)
+
+        arrays = self.fetch_chunk(symbol, interval, chunk)
+        self.store_part(path, arrays)
+        return arrays
+
+    def download(self, symbol, interval, ranges, step_ms):
+        chunks = self.chunks(ranges, step_ms)
+        if not chunks:
+            return parse_klines([])
+
+        # submitted rather than mapped: a failed chunk must not cancel the rest, they are kept as parts
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            futures = [executor.submit(self.download_chunk, symbol, interval, chunk) for chunk in chunks]
+            results = [future.result() for future in futures]
+
+        for chunk in chunks:
+            os.remove(self.part_path(symbol, interval, chunk))
+
+        return concatenate_arrays(results)
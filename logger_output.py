@@ -4,6 +4,8 @@ from telebot import TeleBot
 from telebot.types import BotCommand
 
 from config import *
+from metrics import metrics
+from tracing import traced
 
 sync_bot = TeleBot(token=LogConfig.TELEGRAM_TOKEN)
 
@@ -17,6 +19,7 @@ def set_bot_commands_sync():
     global sync_bot
     sync_bot.set_my_commands(commands)
 
+@traced("telegram")
 def send_telegram_message(message, user_id=None, error=False):
     try:
         if not user_id:
@@ -25,18 +28,21 @@ def send_telegram_message(message, user_id=None, error=False):
         max_length = 4000
         short_text = message if len(message) <= max_length else message[:2000] + "\n...\n" + message[-2000:]
 
-        sync_bot.send_message(chat_id=user_id, text=short_text, parse_mode="Markdown" if not error else None)
+        with metrics.timer("telegram"):
+            sync_bot.send_message(chat_id=user_id, text=short_text, parse_mode="Markdown" if not error else None)
     except Exception as e:
+        metrics.error("telegram")
         print(f"Failed to send message: {e} | user_id {user_id}")
 
-def log(msg, user=None):
-    if not BacktestConfig.enabled and RealTimeConfig.notify:
+def log(msg, user=None, notify=True):
+    # notify=False keeps repetitive messages (retries, polling) out of Telegram
+    if notify and not BacktestConfig.enabled and RealTimeConfig.notify:
         send_telegram_message(msg, user)
 
     logging.info(msg)
 
-def log_error(msg):
-    if not BacktestConfig.enabled and RealTimeConfig.notify:
+def log_error(msg, notify=True):
+    if notify and not BacktestConfig.enabled and RealTimeConfig.notify:
         send_telegram_message(msg, error=True)
 
     logging.error(f"[Error] {msg}")
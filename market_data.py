@@ -2,26 +2,35 @@ import websocket
 import json
 import threading
 
-from config import BacktestConfig
+from candle_journal import candle_journal
+from config import BacktestConfig, RealTimeConfig
 from logger_output import log_error, log
 
 
 class PriceTracker:
-    def __init__(self):
-        self.symbol = BacktestConfig.symbol.lower()
-        self.url = f"wss://fstream.binance.com/ws/{self.symbol}@markPrice"
+    """Mark prices of all symbols over one combined stream."""
+    def __init__(self, symbols):
+        self.symbols = symbols
+        streams = '/'.join(f"{symbol.lower()}@markPrice" for symbol in symbols)
+        self.url = f"wss://fstream.binance.com/stream?streams={streams}"
         self.ws = None
         self.running = False
-        self.price = None
+        self.prices = {}
         self.lock = threading.Lock()
-        self._connect()
+        if RealTimeConfig.mark_price_stream:
+            self._connect()
 
     def _on_message(self, ws, message):
-        data = json.loads(message)
+        data = json.loads(message).get('data', {})
         if "p" in data:
             price = float(data['p'])
-            with self.lock:
-                self.price = price
+            if candle_journal:
+                candle_journal.record_price(price, data['s'])
+            self.set_price(price, data['s'])
+
+    def set_price(self, price, symbol=None):
+        with self.lock:
+            self.prices[symbol or BacktestConfig.symbol] = price
 
     def _on_close(self, ws, close_status_code, close_msg):
         log_error(f"Price websocket connection closed: {close_status_code} | {close_msg}")
@@ -31,7 +40,7 @@ class PriceTracker:
         log_error(f"Error in price websocket: {error}")
 
     def _on_open(self, ws):
-        log(f"{self.symbol} websocket connection opened")
+        log(f"{', '.join(self.symbols)} price websocket connection opened")
 
     def _connect(self):
         self.ws = websocket.WebSocketApp(
@@ -53,9 +62,9 @@ class PriceTracker:
             self.ws.close()
             self.running = False
 
-    def get_price(self):
+    def get_price(self, symbol=None):
         with self.lock:
-            return self.price
+            return self.prices.get(symbol or BacktestConfig.symbol)
 
 
-price_tracker = PriceTracker()
+price_tracker = PriceTracker(RealTimeConfig.symbols)
@@ -1,13 +1,13 @@
 import datetime
-from collections import deque
 
 import pytz
+from binance.helpers import interval_to_milliseconds
 
-from config import BacktestConfig
+from config import BacktestConfig, OverviewConfig
 from formatting import format_price
-from indicators import get_btc_dominance, get_fear_and_greed_index
-from chart import fetch_chart
-from trade_logic import determine_trend
+from market_sources import market_sources
+from overview_store import OverviewStore, snapshot_frame
+from trade_logic import determine_trend, trend_of
 
 
 def rsi_conditions(rsi):
@@ -84,15 +84,25 @@ def characterize_adx(adx_value):
     # return float(ticker['price'])
 
 
-def support_check_message(formatted_data, previous_formatted_data, support_level):
-    if formatted_data[support_level] >= previous_formatted_data[support_level]:
+def find_broken_levels(formatted_data, previous_formatted_data):
+    broken_levels = {}
+    for level in ['Support_7', 'Support_25', 'Support_50', 'Support_99']:
+        if formatted_data[level] < previous_formatted_data[level]:
+            broken_levels[level] = previous_formatted_data[level]
+    for level in ['Resistance_7', 'Resistance_25', 'Resistance_50', 'Resistance_99']:
+        if formatted_data[level] > previous_formatted_data[level]:
+            broken_levels[level] = previous_formatted_data[level]
+    return broken_levels
+
+def support_check_message(broken_levels, support_level):
+    if support_level not in broken_levels:
         return ''
-    return f' ⚠️\n💥 `{format_price(previous_formatted_data[support_level])}` 📉'
+    return f' ⚠️\n💥 `{format_price(broken_levels[support_level])}` 📉'
 
-def resistance_check_message(formatted_data, previous_formatted_data, resist_level):
-    if formatted_data[resist_level] <= previous_formatted_data[resist_level]:
+def resistance_check_message(broken_levels, resist_level):
+    if resist_level not in broken_levels:
         return ''
-    return f' ⚠️\n💥 `{format_price(previous_formatted_data[resist_level])}` 📈'
+    return f' ⚠️\n💥 `{format_price(broken_levels[resist_level])}` 📈'
 
 def format_btc_dominance(current_dominance, previous_dominance):
     change = current_dominance - previous_dominance
@@ -245,7 +255,7 @@ def btc_dominance_level_description(current_dominance):
     else:
         return f"_very low_ | 🔴"
 
-def get_trading_session():
+def get_trading_session(now_utc=None):
     # Задаем временные зоны для каждой сессии
     timezone_utc = pytz.timezone('UTC')
 
@@ -257,7 +267,8 @@ def get_trading_session():
     }
 
     # Получаем текущее время по UTC
-    now_utc = datetime.datetime.now(timezone_utc)
+    if now_utc is None:
+        now_utc = datetime.datetime.now(timezone_utc)
 
     # Определяем сессию
     if sessions['american']['start'] <= now_utc.hour < sessions['american']['end']:
@@ -269,27 +280,92 @@ def get_trading_session():
     else:
         return 'Outside Trading Hours'
 
-class OverviewPrinter:
-    def __init__(self):
-        self.max_overviews = 48
-        self.last_market_overviews = deque(maxlen=self.max_overviews)
+OVERVIEW_SECTIONS = ('price', 'trend', 'support_resistance', 'sentiment')
+OVERVIEW_DISPLAY = ('price', 'volume', 'rsi', 'trend', 'ema', 'bands', 'support', 'resistance', 'dominance', 'sentiment')
 
-    def append_market_overview(self, row, previous_row):
-        trend, trend_type = determine_trend(row)
-        formatted_data = {key: value for key, value in list(row.to_dict().items())}
-        previous_formatted_data = {key: value for key, value in list(previous_row.to_dict().items())}
 
-        dominance_now, dominance_yesterday = get_btc_dominance()
+def settings_mask(settings, keys):
+    """Enabled `keys` of a user's settings dict as a bitmask, None (everything shown) for no settings."""
+    if not settings:
+        return None
+    return sum(1 << bit for bit, key in enumerate(keys) if settings[key])
+
+
+class OverviewPrinter:
+    def __init__(self):
+        # numeric snapshots, rendered when a user pages to one
+        self.overviews = OverviewStore(OverviewConfig.capacity, OverviewConfig.path)
+        # texts by (position, sections mask, display mask), users viewing the same candle share one render.
+        # Replaced, not cleared, on append: a render racing the append lands in the discarded dict.
+        self.rendered = {}
+
+    def append_market_overview(self, row, previous_row, broken_levels=None, timestamp=None):
+        determine_trend(row)
+        if broken_levels is None:
+            broken_levels = find_broken_levels(row, previous_row)
+        created = datetime.datetime.now(datetime.timezone.utc)
+
+        snapshot = {
+            'timestamp': timestamp if timestamp is not None else created,
+            'row': row,
+            'previous_row': previous_row,
+            'broken_levels': broken_levels,
+            # cached, refreshed in the background, None until a provider answered once
+            'dominance': market_sources.dominance.get(),
+            'fear_and_greed': market_sources.fear_and_greed.get(),
+            'chart_url': market_sources.chart.get(),
+            'created': created,
+        }
+        self.overviews.append(snapshot)
+        self.rendered = {}
+
+        return snapshot
+
+    def warm_start(self, history, count=None):
+        """
+        Overviews of the last `count` candles of an indicator `history` that are newer than the
+        stored ones, so users have an overview right after a restart. The sentiment of all of them
+        is the last known one, the chart is left out.
+        """
+        count = OverviewConfig.warm_start if count is None else count
+        last_stored = self.overviews.last_timestamp()
+        if last_stored is not None:
+            history = history[history.index >= last_stored]
+        history = history.iloc[-(count + 1):]
+        if len(history) < 2:
+            return 0
+
+        if len(self.overviews):
+            last = self.overviews.get(-1)
+            dominance, fear_and_greed = last['dominance'], last['fear_and_greed']
+        else:
+            dominance, fear_and_greed = market_sources.dominance.get(), market_sources.fear_and_greed.get()
+
+        frame = snapshot_frame(history, dominance, fear_and_greed, interval_to_milliseconds(BacktestConfig.interval))
+        self.overviews.extend(frame, {'fear_and_greed_text': [fear_and_greed[1] or ''] * len(frame),
+                                      'chart_url': [''] * len(frame)})
+        self.rendered = {}
+        return len(frame)
+
+    @staticmethod
+    def overview_sections(snapshot):
+        """Section texts of a stored snapshot."""
+        formatted_data = dict(snapshot['row'])
+        previous_formatted_data = dict(snapshot['previous_row'])
+        broken_levels = snapshot['broken_levels']
+        trend, trend_type = trend_of(formatted_data)
+
+        dominance_now, dominance_yesterday = snapshot['dominance']
         # trend_icon_separator = '🔺' if trend == 'LONG' else '🔻'
-        fear_and_greed_value, fear_and_greed_text, fear_and_greed_value_yesterday, fear_and_greed_text_yesterday = get_fear_and_greed_index()
+        fear_and_greed_value, fear_and_greed_text, fear_and_greed_value_yesterday, fear_and_greed_text_yesterday = snapshot['fear_and_greed']
 
         separator = '▫️'
         # section_separator = "---\n"
 
         overview = {}
 
-        overview['Session'] = get_trading_session()
-        overview['Timestamp'] = datetime.datetime.utcnow().strftime("%d.%m %H:%M")
+        overview['Session'] = get_trading_session(snapshot['created'])
+        overview['Timestamp'] = snapshot['created'].strftime("%d.%m %H:%M")
 
         overview['Price'] = (
             f"\n💰 *Price*\n"
@@ -328,42 +404,51 @@ class OverviewPrinter:
 
         overview['Support'] = (
             f"\n📉 *Support Levels*\n"
-            f"🔹 Immediate (_7{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Support_7'])}` {support_check_message(formatted_data, previous_formatted_data, 'Support_7')}\n"
-            f"🔹 Short term (_25{BacktestConfig.interval_period}_):   `{format_price(formatted_data['Support_25'])}` {support_check_message(formatted_data, previous_formatted_data, 'Support_25')}\n"
-            f"🔹 Mid term (_50{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Support_50'])}` {support_check_message(formatted_data, previous_formatted_data, 'Support_50')}\n"
-            f"🔹 Long term (_99{BacktestConfig.interval_period}_):    `{format_price(formatted_data['Support_99'])}` {support_check_message(formatted_data, previous_formatted_data, 'Support_99')}\n"
+            f"🔹 Immediate (_7{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Support_7'])}` {support_check_message(broken_levels, 'Support_7')}\n"
+            f"🔹 Short term (_25{BacktestConfig.interval_period}_):   `{format_price(formatted_data['Support_25'])}` {support_check_message(broken_levels, 'Support_25')}\n"
+            f"🔹 Mid term (_50{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Support_50'])}` {support_check_message(broken_levels, 'Support_50')}\n"
+            f"🔹 Long term (_99{BacktestConfig.interval_period}_):    `{format_price(formatted_data['Support_99'])}` {support_check_message(broken_levels, 'Support_99')}\n"
         )
 
         overview['Resistance'] = (
             f"\n📈 *Resistance Levels*\n"
-            f"🔸 Immediate (_7{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Resistance_7'])}` {resistance_check_message(formatted_data, previous_formatted_data, 'Resistance_7')}\n"
-            f"🔸 Short term (_25{BacktestConfig.interval_period}_):   `{format_price(formatted_data['Resistance_25'])}` {resistance_check_message(formatted_data, previous_formatted_data, 'Resistance_25')}\n"
-            f"🔸 Mid term (_50{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Resistance_50'])}` {resistance_check_message(formatted_data, previous_formatted_data, 'Resistance_50')}\n"
-            f"🔸 Long term (_99{BacktestConfig.interval_period}_):    `{format_price(formatted_data['Resistance_99'])}` {resistance_check_message(formatted_data, previous_formatted_data, 'Resistance_99')}\n"
+            f"🔸 Immediate (_7{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Resistance_7'])}` {resistance_check_message(broken_levels, 'Resistance_7')}\n"
+            f"🔸 Short term (_25{BacktestConfig.interval_period}_):   `{format_price(formatted_data['Resistance_25'])}` {resistance_check_message(broken_levels, 'Resistance_25')}\n"
+            f"🔸 Mid term (_50{BacktestConfig.interval_period}_):     `{format_price(formatted_data['Resistance_50'])}` {resistance_check_message(broken_levels, 'Resistance_50')}\n"
+            f"🔸 Long term (_99{BacktestConfig.interval_period}_):    `{format_price(formatted_data['Resistance_99'])}` {resistance_check_message(broken_levels, 'Resistance_99')}\n"
         )
 
         overview['Dominance'] = (
             "\n⚖️ *BTC Dominance*\n"
             f"{separator} `{dominance_now:.1f}%` | {format_btc_dominance(dominance_now, dominance_yesterday)} | {btc_dominance_level_description(dominance_now)}\n"
-        )
+        ) if dominance_now is not None else f"\n⚖️ *BTC Dominance*\n{separator} `n/a`\n"
 
         overview['FearAndGreed'] = (
             f"\n{fear_and_greed_icon(fear_and_greed_value)} *Fear & Greed*\n"
             f"{separator} `{fear_and_greed_value}` | {format_value_change(fear_and_greed_value, fear_and_greed_value_yesterday)} | _{fear_and_greed_text.lower()}_ | {fear_and_greed_status_icon(fear_and_greed_value)}\n"
-        )
-
-        overview['ChartURL'] = fetch_chart()
+        ) if fear_and_greed_value is not None else f"\n😐 *Fear & Greed*\n{separator} `n/a`\n"
 
-        self.last_market_overviews.append(overview)
+        overview['ChartURL'] = snapshot['chart_url']
 
         return overview
 
     def get_last(self, settings=None, display_settings=None, index=-1):
-        return self.overview_to_text(self.last_market_overviews[index] if len(self.last_market_overviews) else None, settings, display_settings)
-
-    def overview_to_text(self, overview, settings=None, display_settings=None):
-        if not overview:
+        rendered = self.rendered
+        count = len(self.overviews)
+        if not count:
+            return self.overview_to_text(None)
+
+        key = (index % count, settings_mask(settings, OVERVIEW_SECTIONS),
+               settings_mask(display_settings, OVERVIEW_DISPLAY))
+        text = rendered.get(key)
+        if text is None:
+            text = rendered[key] = self.overview_to_text(self.overviews.get(index), settings, display_settings)
+        return text
+
+    def overview_to_text(self, snapshot, settings=None, display_settings=None):
+        if not snapshot:
             return "💤 Overview is not collected yet"
+        overview = self.overview_sections(snapshot)
         all_enabled = not display_settings
         price_enabled = not settings or settings['price']
         trend_enabled = not settings or settings['trend']
@@ -0,0 +1,93 @@
+import threading
+import time
+import traceback
+
+from chart import fetch_chart
+from config import ChartImgConfig, MarketSourcesConfig
+from indicators import get_btc_dominance, get_fear_and_greed_index
+from logger_output import log, log_error
+from metrics import metrics
+
+
+class CachedSource:
+    """
+    Last good value of a slow external source. Reads never block and keep returning the last
+    good value after it expired (stale-while-revalidate), the refresher fetches a new one in
+    the background. `fallback` is returned until the first fetch succeeded. An outage is
+    alerted once when it starts and once when the source recovers, the retries in between
+    are only logged and counted.
+    """
+    def __init__(self, name, fetch, ttl, fallback=None, valid=lambda value: value is not None):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.valid = valid
+        self.value = fallback
+        self.updated = None
+        self.next_refresh = 0.0
+        self.failing = False
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        self.updated = time.monotonic()
+        self.next_refresh = self.updated + self.ttl
+
+    def age(self):
+        return time.monotonic() - self.updated if self.updated is not None else None
+
+    def refresh(self):
+        try:
+            with metrics.timer(f"source_{self.name}"):
+                value = self.fetch()
+            if self.valid(value):
+                self.set(value)
+                if self.failing:
+                    self.failing = False
+                    log(f"{self.name} source recovered")
+                return
+            log_error(f"{self.name} source returned no data: {value}", notify=not self.failing)
+        except Exception as source_exception:
+            log_error(f"{self.name} source failed: {source_exception}\n"
+                      f"{traceback.format_exc()}", notify=not self.failing)
+        self.failing = True
+        metrics.error(f"source_{self.name}")
+        # the last good value stays, a provider that is down is retried at a slower pace
+        self.next_refresh = time.monotonic() + min(self.ttl, MarketSourcesConfig.retry_delay)
+
+
+class MarketSources:
+    """Market sentiment and chart sources of the overview, refreshed on their own schedule by one thread."""
+    def __init__(self):
+        self.dominance = CachedSource("dominance", get_btc_dominance, MarketSourcesConfig.dominance_ttl,
+                                      fallback=(None, None), valid=lambda value: bool(value and value[0]))
+        self.fear_and_greed = CachedSource("fear_and_greed", get_fear_and_greed_index,
+                                           MarketSourcesConfig.fear_and_greed_ttl, fallback=(None, None, None, None),
+                                           valid=lambda value: bool(value) and value[0] is not None)
+        self.chart = CachedSource("chart", fetch_chart, MarketSourcesConfig.chart_ttl)
+        self.sources = [self.dominance, self.fear_and_greed] + ([self.chart] if ChartImgConfig.enabled else [])
+        self.thread = None
+
+        for source in self.sources:
+            metrics.gauge(f"source_{source.name}_age_seconds", source.age)
+
+    def refresh_due(self):
+        now = time.monotonic()
+        for source in self.sources:
+            if now >= source.next_refresh:
+                source.refresh()
+
+    def run(self):
+        while True:
+            self.refresh_due()
+            time.sleep(MarketSourcesConfig.refresh_period)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+
+market_sources = MarketSources()
@@ -0,0 +1,125 @@
+import bisect
+import contextlib
+import json
+import threading
+import time
+
+# seconds, the last bucket is +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, capped at the observed max."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+
+class Metrics:
+    """
+    Stage latency histograms, error counters and gauges of the live process, exported by
+    fake_server as Prometheus text (/metrics) and JSON (/status).
+    """
+    def __init__(self, prefix="trendbeat"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.errors = {}
+        self.gauges = {}
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def error(self, stage):
+        with self.lock:
+            self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def gauge(self, name, read):
+        """Registers `read()` to be sampled on every export, e.g. a queue length."""
+        self.gauges[name] = read
+
+    def sample_gauges(self):
+        values = {}
+        for name, read in list(self.gauges.items()):
+            try:
+                values[name] = float(read())
+            except Exception:
+                values[name] = None
+        return values
+
+    def prometheus(self):
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# TYPE {name} histogram"]
+        with self.lock:
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.append(f"# TYPE {self.prefix}_errors_total counter")
+            for stage, count in sorted(self.errors.items()):
+                lines.append(f'{self.prefix}_errors_total{{stage="{stage}"}} {count}')
+
+        for gauge, value in sorted(self.sample_gauges().items()):
+            lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+            lines.append(f"{self.prefix}_{gauge} {'NaN' if value is None else value}")
+        lines.append(f"# TYPE {self.prefix}_uptime_seconds gauge")
+        lines.append(f"{self.prefix}_uptime_seconds {time.time() - self.started}")
+        return '\n'.join(lines) + '\n'
+
+    def status(self):
+        with self.lock:
+            stages = {stage: {
+                'count': histogram.count,
+                'mean_ms': histogram.sum / max(1, histogram.count) * 1000,
+                'p50_ms': histogram.quantile(0.5) * 1000,
+                'p99_ms': histogram.quantile(0.99) * 1000,
+                'max_ms': histogram.max * 1000,
+            } for stage, histogram in self.stages.items()}
+            errors = dict(self.errors)
+
+        return json.dumps({
+            'uptime_seconds': time.time() - self.started,
+            'stages': stages,
+            'errors': errors,
+            'gauges': self.sample_gauges(),
+        }, indent=2)
+
+
+metrics = Metrics()
@@ -1,5 +1,6 @@
 import traceback
 
+from backtest_engine import BacktestArrays, run_backtest
 from indicators import calculate_indicators
 from historical_data_loader import HistoricalDataLoader
 from state import *
@@ -40,15 +41,13 @@ if BacktestConfig.enabled:
     # historical_data = history_data_loader.get_historical_data(BacktestConfig.symbol, BacktestConfig.interval, BacktestConfig.start_date, BacktestConfig.end_date)
     # historical_data = calculate_indicators(historical_data)
     try:
-        for index, row in history_data_loader.historical_data.iterrows():
-            latest_price = row['close']
-            timestamp = index
-
-            determine_trend(row)
-            for strategy in default_user.strategies.strategies.values():
-                trade_logic(row, timestamp, latest_price, strategy, default_user)
+        backtest_arrays = BacktestArrays(history_data_loader.historical_data)
 
         for strategy in default_user.strategies.strategies.values():
+            result = run_backtest(backtest_arrays, strategy.strategy_config)
+            strategy.stats.load(result.stats())
+            strategy.stats.load_history(result.trade_logs())
+
             print(f"{strategy.strategy_config.name}\n"
                 f"{strategy.stats.dump()}\n"
                 f"PNL: {strategy.stats.cumulative_profit_loss}")
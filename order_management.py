@@ -1,31 +1,40 @@
 from binance.client import Client
 
-from config import BacktestConfig, ConnectionsConfig
+from config import BacktestConfig, ConnectionsConfig, HttpConfig
+from http_client import http_client
 from logger_output import log
+from tracing import traced
 
-client = Client(ConnectionsConfig.TESTNET_API_KEY, ConnectionsConfig.TESTNET_API_SECRET, testnet=ConnectionsConfig.testnet_orders)
+client = Client(ConnectionsConfig.TESTNET_API_KEY, ConnectionsConfig.TESTNET_API_SECRET, testnet=ConnectionsConfig.testnet_orders,
+                requests_params={'timeout': (HttpConfig.connect_timeout, HttpConfig.read_timeout)})
 
 def get_price(symbol):
-    # Получение текущей рыночной цены
-    ticker = client.futures_symbol_ticker(symbol=symbol)
-    return float(ticker['price'])
+    # Получение текущей рыночной цены, публичный эндпоинт через общий пул соединений.
+    # FUTURES_URL stays on mainnet with testnet=True, the client only switches when it signs a call
+    futures_url = client.FUTURES_TESTNET_URL if client.testnet else client.FUTURES_URL
+    response = http_client.get(f"{futures_url}/v1/ticker/price", endpoint="futures_ticker",
+                               params={'symbol': symbol})
+    response.raise_for_status()
+    return float(response.json()['price'])
 
 
-def open_position(position_side, position_state, margin, leverage):
+def order_quantity(margin, leverage, price):
+    # Рассчитываем количество актива с учетом кредитного плеча
+    return round((margin * leverage) / price, 3)  # Округляем до нужного количества знаков после запятой
+
+
+@traced("open_position")
+def open_position(position_side, quantity, symbol=None):
     if not BacktestConfig.send_orders:
         return
+    symbol = symbol or BacktestConfig.symbol
     # Получаем текущую цену актива
-    price = get_price(BacktestConfig.symbol)
-
-    # Рассчитываем количество актива с учетом кредитного плеча
-    quantity = (margin * leverage) / price
-    quantity = round(quantity, 3)  # Округляем до нужного количества знаков после запятой
-    position_state.position_qty = quantity
+    price = get_price(symbol)
 
     # Открываем рыночный ордер на покупку (лонг)
     try:
         order = client.futures_create_order(
-            symbol=BacktestConfig.symbol,
+            symbol=symbol,
             positionSide=position_side,
             side='BUY' if position_side == 'LONG' else 'SELL',
             type='LIMIT',
@@ -42,20 +51,22 @@ def open_position(position_side, position_state, margin, leverage):
     return None
 
 
-def close_position(position_side, position_state, size=None):
+@traced("close_position")
+def close_position(position_side, quantity, symbol=None):
     if not BacktestConfig.send_orders:
         return
+    symbol = symbol or BacktestConfig.symbol
     # Получаем текущую цену актива
-    price = get_price(BacktestConfig.symbol)
+    price = get_price(symbol)
 
     try:
         # Закрываем позицию (обратный ордер к открытому)
         order = client.futures_create_order(
-            symbol=BacktestConfig.symbol,
+            symbol=symbol,
             positionSide=position_side,
             side='SELL' if position_side == 'LONG' else 'BUY',  # Для закрытия шорта используйте 'BUY'
             type='LIMIT',
-            quantity=position_state.position_qty if not size else size,
+            quantity=quantity,
             price=price,
             timeinforce='GTC'
         )
@@ -65,4 +76,4 @@ def close_position(position_side, position_state, size=None):
         log(f"Error during position close: {e}")
         # try again?
 
-    return None
\ No newline at end of file
+    return None
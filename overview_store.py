@@ -0,0 +1,181 @@
+import atexit
+import datetime
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore
+from config import OverviewConfig
+from logger_output import log_error
+from streaming_indicators import COLUMNS
+
+LEVELS = ['Support_7', 'Support_25', 'Support_50', 'Support_99',
+          'Resistance_7', 'Resistance_25', 'Resistance_50', 'Resistance_99']
+PREVIOUS_COLUMNS = [f"previous_{column}" for column in COLUMNS]
+BROKEN_COLUMNS = [f"broken_{level}" for level in LEVELS]
+SOURCE_COLUMNS = ['dominance_now', 'dominance_yesterday', 'fear_and_greed_value', 'fear_and_greed_yesterday', 'created']
+SNAPSHOT_COLUMNS = COLUMNS + PREVIOUS_COLUMNS + BROKEN_COLUMNS + SOURCE_COLUMNS
+TEXT_FIELDS = ['fear_and_greed_text', 'chart_url']
+
+
+def optional(value):
+    return np.nan if value is None else float(value)
+
+
+def present(value):
+    return None if np.isnan(value) else float(value)
+
+
+def snapshot_frame(history, dominance, fear_and_greed, step_ms):
+    """
+    Snapshot rows of every candle of an indicator `history` but the first, which only serves as
+    previous row, in one pass over the columns. Broken levels are the support/resistance moves
+    StreamingIndicators.broken_levels reports, the sentiment is the same for all rows and the
+    creation time is the candle close.
+    """
+    current = history[COLUMNS].to_numpy(dtype=np.float64)
+    previous, current = current[:-1], current[1:]
+    broken = np.full((len(current), len(LEVELS)), np.nan)
+    for i, level in enumerate(LEVELS):
+        column = COLUMNS.index(level)
+        moved = current[:, column] < previous[:, column] if level.startswith('Support') \
+            else current[:, column] > previous[:, column]
+        broken[moved, i] = previous[moved, column]
+
+    index = history.index[1:]
+    sources = np.column_stack([
+        np.full(len(current), optional(dominance[0])), np.full(len(current), optional(dominance[1])),
+        np.full(len(current), optional(fear_and_greed[0])), np.full(len(current), optional(fear_and_greed[2])),
+        (index.values.astype('datetime64[ms]').view(np.int64) + step_ms) / 1000])
+    return pd.DataFrame(np.hstack([current, previous, broken, sources]), index=index, columns=SNAPSHOT_COLUMNS)
+
+
+class OverviewStore:
+    """
+    Market overviews as numeric snapshots, one float64 row per candle: the indicator row,
+    the previous row, the broken levels (NaN when intact), dominance, fear & greed and the
+    creation time, with the two texts (fear & greed label, chart URL) in deques alongside.
+    Texts are rendered from a snapshot when a user pages to it. With a `path` the store is
+    loaded back on start and written by a background thread every OverviewConfig.save_period
+    when it changed, and once more on exit, so the candle path never waits for the disk.
+    """
+    def __init__(self, capacity, path=None):
+        self.capacity = capacity
+        self.path = path
+        self.lock = threading.Lock()
+        self.snapshots = CandleStore(capacity, SNAPSHOT_COLUMNS)
+        self.texts = {field: deque(maxlen=capacity) for field in TEXT_FIELDS}
+        self.dirty = False
+        self.save_lock = threading.Lock()  # the saver thread and the exit flush share one temporary file
+        if path:
+            self.load()
+            threading.Thread(target=self.run_saver, daemon=True).start()
+            atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def last_timestamp(self):
+        with self.lock:
+            return self.snapshots.last_timestamp()
+
+    def append(self, snapshot):
+        """Stores a snapshot in the form `get` returns it."""
+        row, previous_row = snapshot['row'], snapshot['previous_row']
+        dominance, fear_and_greed = snapshot['dominance'], snapshot['fear_and_greed']
+        values = [row[column] for column in COLUMNS] + [previous_row[column] for column in COLUMNS] + \
+                 [optional(snapshot['broken_levels'].get(level)) for level in LEVELS] + \
+                 [optional(dominance[0]), optional(dominance[1]), optional(fear_and_greed[0]),
+                  optional(fear_and_greed[2]), snapshot['created'].timestamp()]
+
+        with self.lock:
+            self.snapshots.append(snapshot['timestamp'], np.asarray(values, dtype=np.float64))
+            self.texts['fear_and_greed_text'].append(fear_and_greed[1] or '')
+            self.texts['chart_url'].append(snapshot['chart_url'] or '')
+            self.dirty = True
+
+    def get(self, position):
+        with self.lock:
+            values = self.snapshots.row(position)
+            if position < 0:
+                position += len(self.snapshots)
+            fear_and_greed_text = self.texts['fear_and_greed_text'][position]
+            chart_url = self.texts['chart_url'][position]
+
+        fear_and_greed_value = present(values['fear_and_greed_value'])
+        fear_and_greed_yesterday = present(values['fear_and_greed_yesterday'])
+        return {
+            'timestamp': values.name,
+            'row': dict(zip(COLUMNS, values.iloc[:len(COLUMNS)].tolist())),
+            'previous_row': dict(zip(COLUMNS, values.iloc[len(COLUMNS):2 * len(COLUMNS)].tolist())),
+            'broken_levels': {level: float(values[f"broken_{level}"]) for level in LEVELS
+                              if not np.isnan(values[f"broken_{level}"])},
+            'dominance': (present(values['dominance_now']), present(values['dominance_yesterday'])),
+            # the index is an integer, it is rendered as one
+            'fear_and_greed': (None if fear_and_greed_value is None else int(fear_and_greed_value),
+                               fear_and_greed_text or None,
+                               None if fear_and_greed_yesterday is None else int(fear_and_greed_yesterday), None),
+            'chart_url': chart_url or None,
+            'created': datetime.datetime.fromtimestamp(values['created'], datetime.timezone.utc),
+        }
+
+    def extend(self, frame, texts):
+        """Snapshot rows of `snapshot_frame`, with a list per text field."""
+        with self.lock:
+            self.snapshots.extend(frame)
+            for field in TEXT_FIELDS:
+                self.texts[field].extend(texts[field])
+            self.dirty = True
+
+    def run_saver(self):
+        while True:
+            time.sleep(OverviewConfig.save_period)
+            self.flush()
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                self.dirty = False
+                values = self.snapshots.values().copy()
+                timestamps = self.snapshots.timestamps[self.snapshots.start:self.snapshots.end].copy()
+                texts = {field: np.array(list(self.texts[field]), dtype=str) for field in TEXT_FIELDS}
+
+            temporary_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temporary_path, 'wb') as file:
+                    np.savez(file, values=values, timestamps=timestamps, columns=np.array(SNAPSHOT_COLUMNS), **texts)
+                os.replace(temporary_path, self.path)
+            except OSError as store_exception:
+                self.dirty = True
+                log_error(f"Failed to store market overviews to {self.path}: {store_exception}")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                columns = {column: i for i, column in enumerate(data['columns'].tolist())}
+                stored = data['values']
+                values = np.full((len(SNAPSHOT_COLUMNS), stored.shape[1]), np.nan, dtype=np.float64)
+                # columns added since the file was written stay NaN
+                for i, column in enumerate(SNAPSHOT_COLUMNS):
+                    if column in columns:
+                        values[i] = stored[columns[column]]
+                timestamps = data['timestamps']
+                texts = {field: data[field].tolist() for field in TEXT_FIELDS}
+        except (OSError, KeyError, ValueError) as load_exception:
+            log_error(f"Failed to load market overviews from {self.path}: {load_exception}")
+            return
+
+        frame = pd.DataFrame(values.T, index=pd.DatetimeIndex(timestamps.view('datetime64[ns]')),
+                             columns=SNAPSHOT_COLUMNS)
+        self.extend(frame, texts)
+        self.dirty = False
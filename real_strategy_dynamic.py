@@ -4,19 +4,19 @@ import time
 import traceback
 
 import market_overview
-from config import RealTimeConfig
+from config import BacktestConfig, RealTimeConfig
 from fake_server import run_web_server
-from historical_data_loader import HistoricalDataLoader
+from historical_data_loader import load_symbols
 from logger_output import log_error, log
-from state import UserManager
+from market_sources import market_sources
+from metrics import metrics
+from state import MarketState, UserManager
 from tg_input import run_bot_server
-from trade_logic import trade_logic
+from trade_logic import determine_trend, trade_logic_all
 
-threading.Thread(target=run_web_server, daemon=True).start()
+user_manager = None
 
-user_manager = UserManager()
-
-def kline_handler(update):
+def kline_handler(update, symbol=None, interval=None, intrabar=False):
     # while True:
     try:
         # def is_first_minute():
@@ -29,41 +29,62 @@ def kline_handler(update):
 
         # update = history_data_loader.get_update()
         if update:
-            row, previous_row, timestamp = update
-            try:
-                market_overview.overview_printer.append_market_overview(row, previous_row)
-            except Exception as e:
-                log_error(f"Failed to append market overview! {e}\n"
-                          f"{traceback.format_exc()}")
+            symbol = symbol or BacktestConfig.symbol
+            interval = interval or BacktestConfig.interval
+            row, previous_row, timestamp, broken_levels = update
+            if intrabar:
+                # provisional row of an unclosed candle: the trend and overview follow closed candles only
+                with metrics.timer("intrabar_exits"):
+                    trade_logic_all(row, timestamp=timestamp, latest_price=row['close'],
+                                    users=user_manager.users.values(), symbol=symbol, interval=interval,
+                                    exits_only=True)
+                return
+            # the overview is about the main symbol and interval, the other markets only need their trend
+            if symbol == BacktestConfig.symbol and interval == BacktestConfig.interval:
+                try:
+                    with metrics.timer("market_overview"):
+                        market_overview.overview_printer.append_market_overview(row, previous_row, broken_levels, timestamp)
+                except Exception as e:
+                    metrics.error("market_overview")
+                    log_error(f"Failed to append market overview! {e}\n"
+                              f"{traceback.format_exc()}")
+            else:
+                determine_trend(row, market=f"{symbol} {interval}", market_state=MarketState.of(symbol, interval))
             latest_price = row['close']
 
-            for user_data in list(user_manager.users.values()):
-                for strategy in user_data.strategies.strategies.values():
-                    try:
-                        trade_logic(row, strategy=strategy, timestamp=timestamp, latest_price=latest_price, user=user_data)
-                    except Exception as user_exception:
-                        log_error(f"User strategy failed: {user_exception}\n"
-                                  f"{traceback.format_exc()}")
+            with metrics.timer("strategies"):
+                trade_logic_all(row, timestamp=timestamp, latest_price=latest_price,
+                                users=user_manager.users.values(), symbol=symbol, interval=interval)
         #
         # if not RealTimeConfig.first_minute_check:
         #     time.sleep(60)
 
     except Exception as e:
+        # no pause here: the caller holds the lock every symbol's candles are processed under
+        metrics.error("kline_handler")
         log_error(f"Error occurred: {e}\n"
             f"{traceback.format_exc()}")
-        time.sleep(300)
 
-try:
-    history_data_loader = HistoricalDataLoader(handler_callback=kline_handler)
-except Exception as e:
-    log_error("Failed to load history!\n"
-              f"{traceback.format_exc()}")
+if __name__ == "__main__":
+    # kline_handler is importable on its own, replay.py drives it with its own users and candles
+    threading.Thread(target=run_web_server, daemon=True).start()
+
+    user_manager = UserManager()
+    market_sources.start()
+
+    # one combined kline stream for every symbol, a symbol that fails to load is left out
+    history_data_loaders, kline_stream = load_symbols(RealTimeConfig.symbols, kline_handler)
+    for loader in history_data_loaders:
+        if loader.symbol == BacktestConfig.symbol:
+            # overviews of the candles closed while the bot was down, under the lock live candles append with
+            with loader.lock, metrics.timer("overview_warm_start"):
+                market_overview.overview_printer.warm_start(loader.historical_data)
 
-log("Started")
+    log("Started")
 
-# threading.Thread(target=main_loop, daemon=True).start()
-try:
-    run_bot_server(user_manager)
-except Exception as e:
-    log_error(f"Running bot failed! {e}\n"
-              f"{traceback.format_exc()}")
+    # threading.Thread(target=main_loop, daemon=True).start()
+    try:
+        run_bot_server(user_manager)
+    except Exception as e:
+        log_error(f"Running bot failed! {e}\n"
+                  f"{traceback.format_exc()}")
@@ -0,0 +1,169 @@
+import argparse
+import functools
+import time
+
+import numpy as np
+
+from config import BacktestConfig, ChartImgConfig, OverviewConfig, RealTimeConfig, RecorderConfig
+from database_helper import DatabaseConfig
+
+# stand-ins have to be configured before the live modules are imported:
+# no mark price socket, no journaling of the replay itself, no database writes, orders or chart requests
+# and no overwriting of the live overview history
+RealTimeConfig.mark_price_stream = False
+RecorderConfig.journal_path = None
+OverviewConfig.path = None
+DatabaseConfig.store_to_db = False
+BacktestConfig.send_orders = False
+ChartImgConfig.enabled = False
+
+import logger_output
+import market_overview
+import real_strategy_dynamic
+from candle_journal import read_journal, record_symbol, HISTORY, KLINE, PRICE
+from dispatcher import trade_dispatcher
+from historical_data_loader import HistoricalDataLoader
+from market_data import price_tracker
+from market_sources import market_sources
+from state import UserManager, UserData
+
+
+class ReplayBot:
+    """Telegram stand-in, messages are only counted."""
+    def __init__(self):
+        self.messages = 0
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        self.messages += 1
+
+    def set_my_commands(self, commands):
+        pass
+
+
+def replay_users(count):
+    user_manager = UserManager(load=False)
+    for user_id in range(1, count + 1):
+        user_data = UserData(user_id)
+        user_data.strategies.register_default_strategies()
+        user_manager.users[user_id] = user_data
+    return user_manager
+
+
+def kline_message(record):
+    _, _, open_ms, open_price, high, low, close, volume = record[:8]
+    return {'k': {'t': open_ms, 's': record_symbol(record), 'o': open_price, 'h': high, 'l': low, 'c': close,
+                  'v': volume, 'x': True}}
+
+
+class ReplayReport:
+    def __init__(self):
+        self.sessions = 0
+        self.candles = 0
+        self.prices = 0
+        self.latencies = []
+        self.elapsed = 0.0
+        self.drain = 0.0
+        self.messages = 0
+        self.trades = 0
+
+    def summary(self):
+        latencies = np.asarray(self.latencies) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        return (
+            f"Sessions: {self.sessions} | candles: {self.candles} | price ticks: {self.prices}\n"
+            f"Wall time: {self.elapsed:.2f}s | throughput: {self.candles / max(self.elapsed, 1e-9):.1f} candles/s\n"
+            f"Candle latency ms: p50 {p50:.2f} | p95 {p95:.2f} | p99 {p99:.2f} | "
+            f"max {latencies.max() if len(latencies) else 0.0:.2f}\n"
+            f"Trades: {self.trades} | telegram messages: {self.messages} | "
+            f"side effects drained {self.drain:.2f}s after the last candle"
+        )
+
+
+class Replay:
+    """
+    Feeds a candle journal back through HistoricalDataLoader.handle_kline and the real
+    kline_handler, with database, Telegram, order, chart and market sentiment calls replaced
+    by in-process stand-ins. Every "h" record starts a new session of its symbol warmed up on
+    the same history the live process started from, so indicators match the recorded run.
+    `speed` scales the recorded gaps between messages, 0 replays without waiting.
+    """
+    def __init__(self, path, speed=None, users=1, dominance=(55.0, 55.0), fear_and_greed=(50, 'Neutral', 50, 'Neutral')):
+        self.path = path
+        self.speed = RecorderConfig.replay_speed if speed is None else speed
+        self.bot = ReplayBot()
+        self.user_manager = replay_users(users)
+
+        logger_output.sync_bot = self.bot
+        # the refresher is never started, the overview reads these
+        market_sources.dominance.set(dominance)
+        market_sources.fear_and_greed.set(fear_and_greed)
+        real_strategy_dynamic.user_manager = self.user_manager
+
+    def load_session(self, record):
+        _, first_open_ms, last_open_ms = record[:3]
+        symbol = record_symbol(record)
+        history = HistoricalDataLoader.get_historical_range(symbol, BacktestConfig.interval,
+                                                            first_open_ms, last_open_ms)
+        return HistoricalDataLoader(handler_callback=functools.partial(real_strategy_dynamic.kline_handler, symbol=symbol),
+                                    forward_load=False, history=history, symbol=symbol)
+
+    def wait(self, received_ms, replay_start, journal_start):
+        if not self.speed:
+            return
+        delay = (received_ms - journal_start) / 1000 / self.speed - (time.perf_counter() - replay_start)
+        if delay > 0:
+            time.sleep(delay)
+
+    def run(self):
+        report = ReplayReport()
+        loaders = {}
+        journal_start = None
+        replay_start = time.perf_counter()
+
+        for record in read_journal(self.path):
+            symbol = record_symbol(record)
+            if record[0] == HISTORY:
+                loaders[symbol] = self.load_session(record)
+                report.sessions += 1
+                continue
+            if symbol not in loaders:
+                # messages recorded before the symbol's first history header have no indicator state to replay on
+                continue
+
+            received_ms = record[1]
+            if journal_start is None:
+                journal_start = received_ms
+                replay_start = time.perf_counter()
+            self.wait(received_ms, replay_start, journal_start)
+
+            if record[0] == PRICE:
+                price_tracker.set_price(record[2], symbol)
+                report.prices += 1
+            elif record[0] == KLINE:
+                # journals without mark price ticks trade at the candle close
+                if price_tracker.get_price(symbol) is None:
+                    price_tracker.set_price(record[6], symbol)
+                started = time.perf_counter()
+                loaders[symbol].handle_kline(kline_message(record))
+                report.latencies.append(time.perf_counter() - started)
+                report.candles += 1
+
+        report.elapsed = time.perf_counter() - replay_start
+        # trade side effects run on the dispatcher, messages are only counted once they ran
+        trade_dispatcher.flush()
+        report.drain = time.perf_counter() - replay_start - report.elapsed
+        report.messages = self.bot.messages
+        report.trades = sum(len(strategy.stats.trade_logs)
+                            for user_data in self.user_manager.users.values()
+                            for strategy in user_data.strategies.strategies.values())
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded candle journal through the live kline handler")
+    parser.add_argument("journal")
+    parser.add_argument("--speed", type=float, default=None, help="speed-up over recorded time, 0 = no waiting")
+    parser.add_argument("--users", type=int, default=1, help="simulated users, each with the default strategies")
+    args = parser.parse_args()
+
+    print(Replay(args.journal, speed=args.speed, users=args.users).run().summary())
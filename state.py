@@ -2,10 +2,11 @@ import copy
 import datetime
 import random
 
-from config import BacktestConfig, StrategyConfig
+from config import BacktestConfig, StrategyConfig, StateVersion
 from database_helper import DatabaseHelper, get_database_helper, DatabaseConfig
 from formatting import format_price, format_number
 from logger_output import log, log_error
+from metrics import metrics
 from trade_drop import calculate_pnl
 
 database_helper = get_database_helper()
@@ -26,25 +27,26 @@ class StrategyStats:
         for key, value in row.items():
             setattr(self, key, value)
 
-    def store(self, strategy_id):
-        data = copy.deepcopy(self.__dict__)
+    def records(self, strategy_id):
+        data = {key: value for key, value in self.__dict__.items()
+                if key not in ('trade_logs', 'successful_trades', 'unsuccessful_trades', 'positions_history')}
         data['strategy_id'] = strategy_id
-        del data["trade_logs"]
-        del data['successful_trades']
-        del data['unsuccessful_trades']
-        del data['positions_history']
-        database_helper.store("strategy_balance", data)
 
         stats_data = {'strategy_id': strategy_id, 'successful_trades': self.successful_trades,
                       'unsuccessful_trades': self.unsuccessful_trades}
-        database_helper.store("strategy_stats", stats_data)
+        return [("strategy_balance", data), ("strategy_stats", stats_data)]
+
+    def store(self, strategy_id):
+        for table, data in self.records(strategy_id):
+            database_helper.store(table, data)
 
     def append_trade(self, user_id, strategy_id, trade_params):
+        """Keeps the trade in memory, storing it to the trade_logs table is up to the caller."""
         self.trade_logs.append(trade_params)
         trade_params["user_id"] = user_id
         trade_params["strategy_id"] = strategy_id
-        database_helper.store("trade_logs", trade_params)
         self.positions_history = self.get_all_positions()
+        return trade_params
 
     def dump_short(self):
         pnl_symbol = '🔺' if self.cumulative_profit_loss >= 0 else '🔻'
@@ -174,6 +176,10 @@ class StrategyStats:
         return full_msg
 
 class PositionState:
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        StateVersion.bump()
+
     def __init__(self):
         self.long_position_opened = False
         self.short_position_opened = False
@@ -192,9 +198,9 @@ class PositionState:
         self.leverage = 0
 
 
-    def dump_short(self):
+    def dump_short(self, symbol=None):
         message = ""
-        current_pnl = calculate_pnl(self)
+        current_pnl = calculate_pnl(self, symbol=symbol)
         # current_pnl_color = "🔴" if current_pnl < 0 else "🟢"
         current_pnl_symbol = '🔺' if current_pnl >= 0 else '🔻'
 
@@ -215,9 +221,9 @@ class PositionState:
 
         return message
 
-    def dump(self):
+    def dump(self, symbol=None):
         message = "💼 *Open Positions*\n\n"
-        current_pnl = calculate_pnl(self)
+        current_pnl = calculate_pnl(self, symbol=symbol)
         current_pnl_color = "🔴" if current_pnl < 0 else "🟢"
         current_pnl_symbol = '🔺' if current_pnl >= 0 else '🔻'
 
@@ -290,14 +296,28 @@ class PositionState:
         for key, value in row.items():
             setattr(self, key, value)
 
-    def store(self, strategy_id):
-        data = self.__dict__
+    def records(self, strategy_id):
+        data = dict(self.__dict__)
         data['strategy_id'] = strategy_id
-        database_helper.store("strategy_position_state", data)
+        return [("strategy_position_state", data)]
+
+    def store(self, strategy_id):
+        for table, data in self.records(strategy_id):
+            database_helper.store(table, data)
 
 class MarketState:
-    trend = None
-    trend_type = None
+    """Trend of one market (symbol, interval), set by determine_trend from its closed candles."""
+    markets = {}  # (symbol, interval): MarketState
+
+    def __init__(self):
+        self.trend = None
+        self.trend_type = None
+
+    @classmethod
+    def of(cls, symbol=None, interval=None):
+        market = (symbol or BacktestConfig.symbol, interval or BacktestConfig.interval)
+        # setdefault: the candle loop and the bot thread may ask for a new market at once
+        return cls.markets.get(market) or cls.markets.setdefault(market, cls())
 
 class UserSettings:
     def __init__(self):
@@ -395,16 +415,21 @@ class UserStrategies:
         msg = ""
         msg += f"🎰 *{strategy.strategy_config.name}*\n\n"
         msg += strategy.stats.dump_short()
-        msg += strategy.position_state.dump_short()
+        msg += strategy.position_state.dump_short(strategy.strategy_config.symbol)
         msg += (strategy.strategy_config.dump(risks=risks, long_rsi=rsi, short_rsi=rsi)
                 + ('──────────\n' if separator else ''))
         return msg
 
+    def add(self, strategy):
+        self.strategies[strategy.strategy_id] = strategy
+        # a new strategy changes no attribute the index would notice
+        StateVersion.bump()
+
     def register_default_strategies(self):
         default_strategies = self.setup_default_strategies()
         for strategy in default_strategies:
             strategy.store()
-            self.strategies[strategy.strategy_id] = strategy
+            self.add(strategy)
 
     def load(self, user_id, user_strategies, position_states, balances, stats, strategy_configs, history):
         if len(user_strategies) == 0:
@@ -420,7 +445,7 @@ class UserStrategies:
             config.load(strategy_configs[strategy_id])
             strategy = TradeStrategy(user_id, config, strategy_id)
             strategy.load(stats[strategy_id], balances[strategy_id], position_states[strategy_id], history[strategy_id] if strategy_id in history else [])
-            self.strategies[strategy_id] = strategy
+            self.add(strategy)
 
 
 class TradeStrategy:
@@ -431,13 +456,22 @@ class TradeStrategy:
         self.position_state = PositionState()
         self.strategy_config = config
 
-    def store_state(self):
+    def state_records(self):
+        """(table, row) snapshots of the balance, stats and position, to be written later by store_records."""
+        return self.stats.records(self.strategy_id) + self.position_state.records(self.strategy_id)
+
+    def store_records(self, records):
         try:
-            self.stats.store(self.strategy_id)
-            self.position_state.store(self.strategy_id)
+            with metrics.timer("db_write"):
+                for table, data in records:
+                    database_helper.store(table, data)
         except Exception as e:
+            metrics.error("db_write")
             log_error(f"Error during storing strategy state: {e}")
 
+    def store_state(self):
+        self.store_records(self.state_records())
+
     def store(self):
         if not self.strategy_id:
             data = {"user_id": self.user_id}
@@ -478,9 +512,10 @@ class UserData:
 
 
 class UserManager:
-    def __init__(self):
+    def __init__(self, load=True):
         self.users = {}
-        self.load_users()
+        if load:
+            self.load_users()
 
     def exists(self, user_id):
         return user_id in self.users
@@ -494,8 +529,11 @@ class UserManager:
     def add_user_if_not_exist(self, user_id, username):
         if not self.exists(user_id):
             database_helper.store("users", {"user_id": user_id, "username": username})
-            self.users[user_id] = UserData(user_id)
-            self.users[user_id].strategies.register_default_strategies()
+            user_data = UserData(user_id)
+            user_data.strategies.register_default_strategies()
+            # joins the live users complete, the version moves after the insert so the index picks it up
+            self.users[user_id] = user_data
+            StateVersion.bump()
 
     def load_users(self):
         users = database_helper.get_table_data("users")
@@ -536,7 +574,7 @@ class UserManager:
         strategy_config_response = db.table("strategy_config").select("""
         strategy_id, name, high_volume_only, position_size, long_buy_rsi_enter, long_buy_additional_enter, long_buy_rsi_exit,
         short_sell_rsi_enter, short_sell_additional_enter, short_sell_rsi_exit,
-        min_adx, allow_weak_trend, close_on_trend_reverse, leverage
+        min_adx, allow_weak_trend, close_on_trend_reverse, leverage, symbol, interval
         """).execute()
         trade_logs_response = db.table("trade_logs").select("""
             id, user_id, strategy_id, timestamp, trade_type, price, size, leverage, full_size, 
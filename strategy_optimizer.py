@@ -0,0 +1,233 @@
+import copy
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest_engine import BACKTEST_COLUMNS, BacktestArrays, run_backtest
+from config import BacktestConfig, OptimizerConfig, StrategyConfig
+
+DEFAULT_SWEEP_SPACE = {
+    'long_buy_rsi_enter': [50, 56, 62, 68],
+    'long_buy_additional_enter': [36, 46],
+    'long_buy_rsi_exit': [72, 78, 84],
+    'short_sell_rsi_enter': [32, 38, 44, 50],
+    'short_sell_additional_enter': [52, 62],
+    'short_sell_rsi_exit': [16, 22, 28],
+    'min_adx': [15, 20, 25],
+    'allow_weak_trend': [False, True],
+    'close_on_trend_reverse': [False, True],
+}
+
+RESULT_COLUMNS = ['pnl', 'win_rate', 'max_drawdown', 'trades']
+
+
+def validate_space(space):
+    defaults = StrategyConfig()
+    for parameter, values in space.items():
+        if not hasattr(defaults, parameter):
+            raise ValueError(f"Unknown strategy parameter: {parameter}")
+        if not len(values):
+            raise ValueError(f"No values to sweep for {parameter}")
+
+
+def grid(space):
+    validate_space(space)
+    parameters = sorted(space)
+    for values in itertools.product(*(space[parameter] for parameter in parameters)):
+        yield dict(zip(parameters, values))
+
+
+def random_sample(space, count, seed=None):
+    validate_space(space)
+    parameters = sorted(space)
+    count = min(count, math.prod(len(space[parameter]) for parameter in parameters))
+    generator = random.Random(seed)
+
+    samples, seen = [], set()
+    while len(samples) < count:
+        sample = {parameter: generator.choice(space[parameter]) for parameter in parameters}
+        key = parameters_key(sample)
+        if key not in seen:
+            seen.add(key)
+            samples.append(sample)
+    return samples
+
+
+def parameters_key(parameters):
+    return json.dumps(parameters, sort_keys=True)
+
+
+def make_config(base_config, parameters):
+    config = copy.copy(base_config)
+    for parameter, value in parameters.items():
+        setattr(config, parameter, value)
+    return config
+
+
+def history_key(arrays):
+    timestamps = arrays.timestamps
+    return f"{BacktestConfig.symbol}_{BacktestConfig.interval}_{timestamps[0].value}_{timestamps[-1].value}_{len(arrays)}"
+
+
+def config_key(config):
+    """Hash of the config fields, results evaluated on another base config must not be reused."""
+    fields = {field: value for field, value in vars(config).items() if field != 'name'}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class SharedBacktestArrays:
+    """Backtest columns copied once into a shared memory block that workers map read-only."""
+    def __init__(self, arrays):
+        self.length = len(arrays)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(8, len(BACKTEST_COLUMNS) * self.length * 8))
+        block = np.ndarray((len(BACKTEST_COLUMNS), self.length), dtype=np.float64, buffer=self.memory.buf)
+        for i, column in enumerate(BACKTEST_COLUMNS):
+            block[i] = getattr(arrays, column)
+
+    def descriptor(self):
+        return self.memory.name, self.length
+
+    def release(self):
+        self.memory.close()
+        self.memory.unlink()
+
+    @staticmethod
+    def attach(name, length):
+        memory = shared_memory.SharedMemory(name=name)
+        block = np.ndarray((len(BACKTEST_COLUMNS), length), dtype=np.float64, buffer=memory.buf)
+        block.flags.writeable = False
+        return memory, BacktestArrays.from_columns({column: block[i] for i, column in enumerate(BACKTEST_COLUMNS)})
+
+
+_worker_memory = None
+_worker_arrays = None
+
+
+def _attach_worker(name, length):
+    global _worker_memory, _worker_arrays
+    _worker_memory, _worker_arrays = SharedBacktestArrays.attach(name, length)
+
+
+def evaluate(arrays, config, parameters=None):
+    summary = run_backtest(arrays, config).summary()
+    return dict(parameters=parameters or {}, **{column: summary[column] for column in RESULT_COLUMNS})
+
+
+def _evaluate_batch(base_config, batch, window=None):
+    arrays = _worker_arrays.slice(*window) if window else _worker_arrays
+    return window, [evaluate(arrays, make_config(base_config, parameters), parameters) for parameters in batch]
+
+
+def evaluate_parallel(arrays, base_config, tasks, workers):
+    """
+    Runs (window, parameter batch) tasks on a process pool sharing `arrays` through shared memory,
+    where window is a (start, end) candle range or None for the whole history.
+    Yields (window, results) as tasks complete.
+    """
+    shared_arrays = SharedBacktestArrays(arrays)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker,
+                                   initargs=shared_arrays.descriptor())
+    try:
+        futures = [executor.submit(_evaluate_batch, base_config, batch, window) for window, batch in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # a consumer that stops early should not wait for the rest of the sweep
+        executor.shutdown(cancel_futures=True)
+        shared_arrays.release()
+
+
+def rank(results, key='pnl'):
+    # drawdown is the only metric where smaller is better
+    return sorted(results, key=lambda result: result[key], reverse=key != 'max_drawdown')
+
+
+def format_table(results, top=20, key='pnl'):
+    lines = [f"{'#':>3} {'PnL':>10} {'Win %':>6} {'DD':>9} {'Trades':>6}  Parameters"]
+    for place, result in enumerate(rank(results, key)[:top], start=1):
+        parameters = ' '.join(f"{name}={value}" for name, value in sorted(result['parameters'].items()))
+        lines.append(f"{place:>3} {result['pnl']:>10.2f} {result['win_rate']:>6.1f} "
+                     f"{result['max_drawdown']:>9.2f} {result['trades']:>6}  {parameters}")
+    return '\n'.join(lines)
+
+
+class StrategyOptimizer:
+    """
+    Evaluates many StrategyConfig variants over one history on a process pool.
+    Finished evaluations are appended to `results_path` and skipped when the same sweep
+    over the same history with the same base config is run again, so an interrupted sweep
+    picks up where it stopped.
+    """
+    def __init__(self, history, base_config=None, workers=None, results_path=None):
+        self.arrays = history if isinstance(history, BacktestArrays) else BacktestArrays(history)
+        self.base_config = base_config or StrategyConfig("Sweep")
+        self.workers = workers or OptimizerConfig.workers
+        self.results_path = results_path or OptimizerConfig.results_path
+        self.history_key = history_key(self.arrays)
+        self.config_key = config_key(self.base_config)
+        self.results = {}
+
+    def load_results(self):
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # last line of an interrupted write
+                    continue
+                if record.get('history') == self.history_key and record.get('config') == self.config_key:
+                    result = record['result']
+                    self.results[parameters_key(result['parameters'])] = result
+
+    def store_results(self, results):
+        with open(self.results_path, 'a') as file:
+            for result in results:
+                file.write(json.dumps({'history': self.history_key, 'config': self.config_key,
+                                       'result': result}) + '\n')
+            file.flush()
+
+    def run(self, parameter_sets, batch_size=None):
+        """Yields results as they complete, previously stored ones first."""
+        batch_size = batch_size or OptimizerConfig.batch_size
+        self.load_results()
+
+        pending = []
+        for parameters in parameter_sets:
+            key = parameters_key(parameters)
+            if key in self.results:
+                yield self.results[key]
+            else:
+                pending.append(parameters)
+        if not pending:
+            return
+
+        tasks = [(None, pending[i:i + batch_size]) for i in range(0, len(pending), batch_size)]
+        for _, results in evaluate_parallel(self.arrays, self.base_config, tasks, self.workers):
+            self.store_results(results)
+            for result in results:
+                self.results[parameters_key(result['parameters'])] = result
+                yield result
+
+    def ranked(self, key='pnl'):
+        return rank(list(self.results.values()), key)
+
+
+if __name__ == "__main__":
+    from historical_data_loader import HistoricalDataLoader
+
+    history_data_loader = HistoricalDataLoader(backload=False, forward_load=False)
+    optimizer = StrategyOptimizer(history_data_loader.historical_data)
+    for evaluated, _ in enumerate(optimizer.run(grid(DEFAULT_SWEEP_SPACE)), start=1):
+        if evaluated % 1000 == 0:
+            print(f"{evaluated} configurations evaluated\n{format_table(optimizer.results.values(), top=5)}")
+
+    print(format_table(optimizer.results.values()))
@@ -0,0 +1,363 @@
+import argparse
+import copy
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+NAN = float('nan')
+
+OHLCV_COLUMNS = ['close', 'high', 'low', 'open', 'volume']
+INDICATOR_COLUMNS = ['EMA_7', 'EMA_25', 'EMA_99', 'RSI_6', 'RSI_15', 'ADX',
+                     'BB_UPPER', 'BB_LOWER', 'BB_MIDDLE',
+                     'Support_7', 'Support_25', 'Support_50', 'Support_99',
+                     'Resistance_7', 'Resistance_25', 'Resistance_50', 'Resistance_99',
+                     'Average_Volume']
+COLUMNS = OHLCV_COLUMNS + INDICATOR_COLUMNS
+
+
+class StreamingEMA:
+    """Same recurrence as ta.trend.ema_indicator (ewm, adjust=False)."""
+    def __init__(self, window):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.count = 0
+        self.value = None
+
+    def update(self, price):
+        self.count += 1
+        if self.value is None:
+            self.value = price
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * price
+
+        return self.value if self.count >= self.window else NAN
+
+
+class StreamingRSI:
+    """Wilder RSI, same as ta.momentum.rsi: the first diff counts as zero movement."""
+    def __init__(self, window):
+        self.window = window
+        self.alpha = 1.0 / window
+        self.count = 0
+        self.previous_price = None
+        self.average_up = None
+        self.average_down = None
+
+    def update(self, price):
+        if self.previous_price is None:
+            up, down = 0.0, 0.0
+        else:
+            diff = price - self.previous_price
+            up, down = max(diff, 0.0), max(-diff, 0.0)
+        self.previous_price = price
+        self.count += 1
+
+        if self.average_up is None:
+            self.average_up, self.average_down = up, down
+        else:
+            self.average_up = (1 - self.alpha) * self.average_up + self.alpha * up
+            self.average_down = (1 - self.alpha) * self.average_down + self.alpha * down
+
+        if self.count < self.window:
+            return NAN
+        if self.average_down == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.average_up / self.average_down)
+
+
+class StreamingADX:
+    """
+    Reproduces ta.trend.adx step by step: true range and directional movement are
+    summed over the first `window` diffs, then Wilder-smoothed; ADX is seeded with the
+    mean of the first `window` DX values and reported as 0 before that.
+    """
+    def __init__(self, window=14):
+        self.window = window
+        self.count = 0
+        self.previous = None
+        self.true_range = 0.0
+        self.plus_dm = 0.0
+        self.minus_dm = 0.0
+        self.dx_seed = []
+        self.value = 0.0
+
+    def _dx(self):
+        plus_di = 100 * self.plus_dm / self.true_range if self.true_range != 0 else 0
+        minus_di = 100 * self.minus_dm / self.true_range if self.true_range != 0 else 0
+        if plus_di + minus_di == 0:
+            return 0
+        return 100 * abs((plus_di - minus_di) / (plus_di + minus_di))
+
+    def update(self, high, low, close):
+        index = self.count
+        self.count += 1
+        if self.previous is None:
+            self.previous = (high, low, close)
+            return 0.0
+
+        previous_high, previous_low, previous_close = self.previous
+        self.previous = (high, low, close)
+
+        true_range = max(high, previous_close) - min(low, previous_close)
+        diff_up = high - previous_high
+        diff_down = previous_low - low
+        plus_dm = diff_up if diff_up > diff_down and diff_up > 0 else 0.0
+        minus_dm = diff_down if diff_down > diff_up and diff_down > 0 else 0.0
+
+        window = self.window
+        if index <= window:
+            self.true_range += true_range
+            self.plus_dm += plus_dm
+            self.minus_dm += minus_dm
+            if index < window:
+                return 0.0
+        else:
+            self.true_range = self.true_range - self.true_range / window + true_range
+            self.plus_dm = self.plus_dm - self.plus_dm / window + plus_dm
+            self.minus_dm = self.minus_dm - self.minus_dm / window + minus_dm
+
+        dx = self._dx()
+        if len(self.dx_seed) < window:
+            self.dx_seed.append(dx)
+            if len(self.dx_seed) < window:
+                return 0.0
+            self.value = sum(self.dx_seed) / window
+        else:
+            self.value = (self.value * (window - 1) + dx) / window
+
+        return self.value
+
+
+class RollingWindow:
+    """
+    Last `window` values with their running mean and sum of squared deviations, updated by
+    Welford's add/remove steps on every append and eviction as pandas' rolling var does, so
+    the mean and variance of the window are O(1) per value.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.mean = 0.0
+        self.squared_deviations = 0.0
+
+    def append(self, value):
+        if self.is_full():
+            self._remove(self.values[0])
+        self.values.append(value)
+        count = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / count
+        self.squared_deviations += delta * (value - self.mean)
+
+    def _remove(self, value):
+        count = len(self.values) - 1
+        if count == 0:
+            self.mean, self.squared_deviations = 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / count
+        self.squared_deviations -= delta * (value - self.mean)
+
+    def variance(self):
+        # cancellation can leave a tiny negative sum for a flat window
+        return max(self.squared_deviations, 0.0) / len(self.values)
+
+    def is_full(self):
+        return len(self.values) == self.window
+
+
+class StreamingBollinger:
+    """Rolling mean +- window_dev population std, as ta.volatility.BollingerBands."""
+    def __init__(self, window=20, window_dev=2):
+        self.window_dev = window_dev
+        self.prices = RollingWindow(window)
+
+    def update(self, price):
+        self.prices.append(price)
+        if not self.prices.is_full():
+            return NAN, NAN, NAN
+
+        middle = self.prices.mean
+        deviation = math.sqrt(self.prices.variance())
+        return middle + self.window_dev * deviation, middle - self.window_dev * deviation, middle
+
+
+class RollingMean:
+    """
+    Rolling mean as pandas computes it: a running sum the value leaving the window is taken
+    from, with Kahan compensation of the rounding error.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.sum = 0.0
+        self.compensation = 0.0
+
+    def _add(self, value):
+        corrected = value - self.compensation
+        total = self.sum + corrected
+        self.compensation = (total - self.sum) - corrected
+        self.sum = total
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            self._add(-self.values[0])
+        self.values.append(value)
+        self._add(value)
+        if len(self.values) < self.window:
+            return NAN
+        return self.sum / self.window
+
+
+class RollingExtremum:
+    """
+    Rolling min (lowest=True) or max over `window` values on a monotonic deque:
+    candidates that can never become the extremum again are dropped on insert, so
+    each value is pushed and popped once and an update is amortized O(1).
+    """
+    def __init__(self, window, lowest=True):
+        self.window = window
+        self.lowest = lowest
+        self.candidates = deque()
+        self.position = 0
+        self.value = NAN
+        self.previous_value = NAN
+
+    def update(self, value):
+        candidates = self.candidates
+        if self.lowest:
+            while candidates and candidates[-1][1] >= value:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] <= value:
+                candidates.pop()
+        candidates.append((self.position, value))
+
+        if candidates[0][0] <= self.position - self.window:
+            candidates.popleft()
+        self.position += 1
+
+        self.previous_value = self.value
+        self.value = candidates[0][1] if self.position >= self.window else NAN
+        return self.value
+
+    @property
+    def broken(self):
+        # the level only moves against its side when the new candle pierced it
+        if self.lowest:
+            return self.value < self.previous_value
+        return self.value > self.previous_value
+
+
+class StreamingIndicators:
+    """
+    Incremental counterpart of indicators.calculate_indicators: every update consumes
+    one closed candle in O(1) (amortized for the rolling extrema) and returns only the new
+    row, with the same columns and values the full `ta` recompute would give for it, up to
+    float rounding of the running sums. `python streaming_indicators.py` checks this.
+    """
+    longest_window = 99
+
+    def __init__(self):
+        self.ema = {'EMA_7': StreamingEMA(7), 'EMA_25': StreamingEMA(25), 'EMA_99': StreamingEMA(50)}
+        self.rsi = {'RSI_6': StreamingRSI(6), 'RSI_15': StreamingRSI(15)}
+        self.adx = StreamingADX(14)
+        self.bollinger = StreamingBollinger(20, 2)
+        # Support_99 is a 50 window in calculate_indicators as well
+        self.support = {'Support_7': RollingExtremum(7), 'Support_25': RollingExtremum(25),
+                        'Support_50': RollingExtremum(50), 'Support_99': RollingExtremum(50)}
+        self.resistance = {'Resistance_7': RollingExtremum(7, lowest=False),
+                           'Resistance_25': RollingExtremum(25, lowest=False),
+                           'Resistance_50': RollingExtremum(50, lowest=False),
+                           'Resistance_99': RollingExtremum(99, lowest=False)}
+        self.average_volume = RollingMean(50)
+        self.last_timestamp = None
+
+    def update_values(self, close, high, low, open, volume):
+        values = {'close': close, 'high': high, 'low': low, 'open': open, 'volume': volume}
+
+        for column, ema in self.ema.items():
+            values[column] = ema.update(close)
+        for column, rsi in self.rsi.items():
+            values[column] = rsi.update(close)
+        values['ADX'] = self.adx.update(high, low, close)
+        values['BB_UPPER'], values['BB_LOWER'], values['BB_MIDDLE'] = self.bollinger.update(close)
+        for column, support in self.support.items():
+            values[column] = support.update(low)
+        for column, resistance in self.resistance.items():
+            values[column] = resistance.update(high)
+        values['Average_Volume'] = self.average_volume.update(volume)
+
+        return values
+
+    def broken_levels(self):
+        """Support/resistance columns broken by the last candle, mapped to the level before the break."""
+        levels = {}
+        for column, level in list(self.support.items()) + list(self.resistance.items()):
+            if level.broken:
+                levels[column] = level.previous_value
+        return levels
+
+    def update(self, timestamp, candle):
+        values = self.update_values(float(candle['close']), float(candle['high']), float(candle['low']),
+                                    float(candle['open']), float(candle['volume']))
+        self.last_timestamp = timestamp
+        return pd.Series(values, index=COLUMNS, name=timestamp, dtype='float64')
+
+    def preview(self, timestamp, candle):
+        """Row `update` would return for this candle, computed on a copy so nothing is committed."""
+        return copy.deepcopy(self).update(timestamp, candle)
+
+    def warmup(self, df):
+        for timestamp, close, high, low, open, volume in zip(df.index, df['close'], df['high'], df['low'],
+                                                            df['open'], df['volume']):
+            self.update_values(close, high, low, open, volume)
+            self.last_timestamp = timestamp
+
+
+def random_candles(count, seed):
+    """Random walk candles with the columns calculate_indicators reads."""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    return pd.DataFrame({'open': close * (1 + rng.normal(0, 0.002, count)), 'close': close,
+                         'high': close * (1 + np.abs(rng.normal(0, 0.005, count))),
+                         'low': close * (1 - np.abs(rng.normal(0, 0.005, count))),
+                         'volume': rng.lognormal(5, 1, count)},
+                        index=pd.date_range('2024-01-01', periods=count, freq='h'))
+
+
+def compare(df, tolerance):
+    """Lines comparing StreamingIndicators row by row with calculate_indicators, and whether they agree."""
+    from indicators import calculate_indicators
+
+    expected = calculate_indicators(df.copy())
+    indicators = StreamingIndicators()
+    streamed = pd.DataFrame([indicators.update(timestamp, candle) for timestamp, candle in df.iterrows()])
+
+    lines, agree = [f"{'Column':<16} {'first row':>9} {'NaN diff':>9} {'max rel err':>12}"], True
+    for column in INDICATOR_COLUMNS:
+        reference, values = expected[column].to_numpy(), streamed[column].to_numpy()
+        nan_mismatch = int((np.isnan(reference) != np.isnan(values)).sum())
+        both = ~np.isnan(reference) & ~np.isnan(values)
+        error = float(np.max(np.abs(reference[both] - values[both]) / np.maximum(np.abs(reference[both]), 1e-12))) \
+            if both.any() else 0.0
+        # first defined row, window - 1: EMA_99 and Support_99 are 50 windows in calculate_indicators too
+        first = int(np.argmax(~np.isnan(values))) if both.any() else -1
+        agree &= nan_mismatch == 0 and error <= tolerance
+        lines.append(f"{column:<16} {first:>9} {nan_mismatch:>9} {error:>12.2e}")
+    return '\n'.join(lines), agree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare StreamingIndicators with indicators.calculate_indicators")
+    parser.add_argument("--candles", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="relative error allowed per value")
+    args = parser.parse_args()
+
+    report, agree = compare(random_candles(args.candles, args.seed), args.tolerance)
+    print(report)
+    print("OK" if agree else "MISMATCH")
+    raise SystemExit(0 if agree else 1)
@@ -0,0 +1,2 @@
+-- Market a strategy trades, existing strategies keep trading the former single symbol.
+alter table strategy_config add column if not exists symbol text not null default 'BTCUSDT';
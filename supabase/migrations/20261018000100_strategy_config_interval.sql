@@ -0,0 +1,2 @@
+-- Candle interval a strategy trades on, the base stream or one of the aggregated timeframes.
+alter table strategy_config add column if not exists "interval" text not null default '1h';
@@ -6,7 +6,7 @@ from telebot.types import BotCommand
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes, filters, MessageHandler, CallbackQueryHandler
 
-from config import LogConfig
+from config import AggregationConfig, BacktestConfig, LogConfig, OverviewConfig, RealTimeConfig
 from trade_drop import force_close_all
 from logger_output import log, set_bot_commands_sync, log_error
 from formatting import format_price
@@ -271,7 +271,7 @@ class BotHandler:
 
         reply_markup = InlineKeyboardMarkup(keyboard)
         new_text = (f"{current_strategy_name}\n\n"
-                   f"{user_strategy.position_state.dump()}\n")
+                   f"{user_strategy.position_state.dump(user_strategy.strategy_config.symbol)}\n")
         if intro:
             await query.message.reply_text(f"{new_text}", parse_mode="Markdown",
                                            reply_markup=reply_markup)
@@ -352,7 +352,7 @@ class BotHandler:
         settings = self.user_manager.get(user_id).user_settings
         overview_sections = settings.overview_sections
 
-        overviews_count = len(market_overview.overview_printer.last_market_overviews)
+        overviews_count = len(market_overview.overview_printer.overviews)
         if (not 'current_overview_position' in context.user_data) or context.user_data['current_overview_position'] == 0:
             context.user_data['current_overview_position'] = overviews_count
 
@@ -371,6 +371,10 @@ class BotHandler:
                     context.user_data['current_overview_position'] -= 1
                 elif section == "next":
                     context.user_data['current_overview_position'] += 1
+                elif section == "back_page":
+                    context.user_data['current_overview_position'] -= OverviewConfig.page_jump
+                elif section == "next_page":
+                    context.user_data['current_overview_position'] += OverviewConfig.page_jump
                 elif section != "refresh":
                     settings_section = section
                     if section == "support/Resistance":
@@ -395,7 +399,9 @@ class BotHandler:
         def state(setting):
             return '💡' if overview_sections[setting] else '🌑'
 
-        current_shown = context.user_data['current_overview_position']
+        # the history is long and the oldest overviews drop out of it, stay inside
+        current_shown = min(max(context.user_data['current_overview_position'], 1), max(overviews_count, 1))
+        context.user_data['current_overview_position'] = current_shown
 
         navigation_keyboard = [InlineKeyboardButton(f"◀️ ", callback_data="toggle_back"),
                              InlineKeyboardButton(f"{current_shown}/{overviews_count}", callback_data="none"),
@@ -403,8 +409,12 @@ class BotHandler:
 
         if current_shown >= overviews_count:
             del navigation_keyboard[2]
+        elif current_shown + OverviewConfig.page_jump <= overviews_count:
+            navigation_keyboard.append(InlineKeyboardButton(f" ⏩", callback_data="toggle_next_page"))
         if current_shown <= 1:
             del navigation_keyboard[0]
+        elif current_shown > OverviewConfig.page_jump:
+            navigation_keyboard.insert(0, InlineKeyboardButton(f"⏪ ", callback_data="toggle_back_page"))
 
         keyboard = []
         display_view = context.user_data['market_overview_sections_view_enabled']
@@ -492,6 +502,7 @@ class BotHandler:
              InlineKeyboardButton("📦 Size", callback_data="setup_strategy_settings_size")],
             [InlineKeyboardButton(f"🍏 Long RSI", callback_data="setup_strategy_settings_long_rsi"),
              InlineKeyboardButton(f"🍎 Short RSI", callback_data="setup_strategy_settings_short_rsi")],
+            [InlineKeyboardButton(f"🎯 Market", callback_data="setup_strategy_settings_market")],
             [InlineKeyboardButton('↩️ Back', callback_data="discard_message"),
              InlineKeyboardButton('🔄 Refresh', callback_data="current_strategy_settings_refresh")]
         ]
@@ -517,6 +528,8 @@ class BotHandler:
             await self.strategy_settings_risk_management(update, context, intro=True)
         elif section == "size":
             await self.strategy_settings_size(update, context, intro=True)
+        elif section == "market":
+            await self.strategy_settings_market(update, context, intro=True)
         elif section == "long_rsi":
             await self.rsi_setup_show(update, context, rsi_type="long")
         elif section == "short_rsi":
@@ -686,6 +699,79 @@ class BotHandler:
             await query.message.reply_text(f"{message}", parse_mode="Markdown",
                                             reply_markup=reply_markup)
 
+    @safe_handler
+    async def strategy_settings_market(self, update, context, intro=False):
+        query = update.callback_query
+        user_id = update.effective_user.id
+        if not intro:
+            await query.answer()
+
+        message_text = query.message.text if query else update.message.text
+        current_strategy, current_strategy_name = self.determine_current_strategy(message_text, context.user_data)
+
+        user_strategy = self.user_manager.get(user_id).strategies.get_strategy(current_strategy)
+        strategy_config = user_strategy.strategy_config
+        position_state = user_strategy.position_state
+
+        hide_keyboard = False
+        warning = ''
+        if intro:
+            context.user_data['intermediate_symbol'] = strategy_config.symbol
+            context.user_data['intermediate_interval'] = strategy_config.interval
+        else:
+            section = query.data.replace("strategy_settings_market_", "")
+            if section == "save":
+                if position_state.long_position_opened or position_state.short_position_opened:
+                    # the open position is priced and closed on the market it was opened on
+                    warning = "⚠️ Close the open position before switching the market or interval\n\n"
+                else:
+                    strategy_config.symbol = context.user_data['intermediate_symbol']
+                    strategy_config.interval = context.user_data['intermediate_interval']
+                    strategy_config.store(current_strategy)
+                    hide_keyboard = True
+            elif section.startswith("symbol_"):
+                context.user_data['intermediate_symbol'] = section.replace("symbol_", "")
+            elif section.startswith("interval_"):
+                context.user_data['intermediate_interval'] = section.replace("interval_", "")
+
+        current_symbol = context.user_data['intermediate_symbol']
+        current_interval = context.user_data['intermediate_interval']
+
+        def tick_mark(value, current):
+            return ' ☑️' if value == current else ''
+
+        symbol_buttons = [InlineKeyboardButton(f"{symbol}{tick_mark(symbol, current_symbol)}",
+                                               callback_data=f"strategy_settings_market_symbol_{symbol}")
+                          for symbol in RealTimeConfig.symbols]
+        keyboard = [symbol_buttons[i:i + 3] for i in range(0, len(symbol_buttons), 3)]
+        keyboard.append([InlineKeyboardButton(f"{interval}{tick_mark(interval, current_interval)}",
+                                              callback_data=f"strategy_settings_market_interval_{interval}")
+                         for interval in [BacktestConfig.interval] + AggregationConfig.timeframes])
+        keyboard.append([InlineKeyboardButton('↩️ Back', callback_data="discard_message"),
+                         InlineKeyboardButton(f"💾 Save", callback_data="strategy_settings_market_save")])
+
+        message = (
+            f"{current_strategy_name}\n\n"
+            f"{warning}"
+            f"🎯 *Market*: `{strategy_config.symbol} {strategy_config.interval}`\n\n"
+            "Select the *Symbol* the strategy trades and the *Interval* of the candles it decides on, "
+            "the bot follows the markets listed below.\n\n"
+            "👇 *Choose below* to set your preferences:"
+        )
+
+        short_msg = (f"{current_strategy_name}\n"
+                     f"🎯 💾 *Market*: `{strategy_config.symbol} {strategy_config.interval}`\n\n")
+
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        if not intro:
+            discard_markup = InlineKeyboardMarkup([[InlineKeyboardButton('↩️ Back', callback_data="discard_message")]])
+            await query.edit_message_text(f"{message if not hide_keyboard else short_msg}", parse_mode="Markdown",
+                                          reply_markup=reply_markup if not hide_keyboard else discard_markup)
+        else:
+            await query.message.reply_text(f"{message}", parse_mode="Markdown",
+                                            reply_markup=reply_markup)
+
     @safe_handler
     async def rsi_setup_show(self, update, context, rsi_type):
         user_id = update.effective_user.id
@@ -912,6 +998,7 @@ def run_bot_server(user_manager):
     application.add_handler(CallbackQueryHandler(bot_handler.overview, pattern="display"))
     application.add_handler(CallbackQueryHandler(bot_handler.strategy_settings_risk_management, pattern="strategy_settings_risk_management"))
     application.add_handler(CallbackQueryHandler(bot_handler.strategy_settings_size, pattern="strategy_settings_position_"))
+    application.add_handler(CallbackQueryHandler(bot_handler.strategy_settings_market, pattern="strategy_settings_market_"))
     application.add_handler(CallbackQueryHandler(bot_handler.strategy_settings, pattern="current_strategy_settings_refresh"))
 
     application.add_handler(CallbackQueryHandler(bot_handler.setup_strategy_settings, pattern="setup_strategy_settings_"))
@@ -0,0 +1,150 @@
+import argparse
+import contextlib
+import contextvars
+import functools
+import glob
+import json
+import logging
+import logging.handlers
+import random
+import secrets
+import threading
+import time
+
+import numpy as np
+
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+class Tracer:
+    """
+    Sampled traces of the candle pipeline written as JSON lines to a rotating file, one line
+    per finished span: {"trace", "span", "start", "ms", ...attributes}.
+    A trace is bound to the current context, the dispatcher carries it over to its workers,
+    so spans of orders, database writes and Telegram sends join the candle that caused them.
+    TraceConfig is read on the first trace: config imports database_helper, which is traced.
+    """
+    def __init__(self):
+        self.sample_rate = None
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("trace")
+        self.logger.propagate = False
+
+    def configure(self):
+        from config import TraceConfig
+
+        with self.lock:
+            if self.sample_rate is not None:
+                return
+            if TraceConfig.path and TraceConfig.sample_rate > 0:
+                handler = logging.handlers.RotatingFileHandler(TraceConfig.path, maxBytes=TraceConfig.max_bytes,
+                                                               backupCount=TraceConfig.backups)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self.logger.addHandler(handler)
+                self.logger.setLevel(logging.INFO)
+            self.sample_rate = TraceConfig.sample_rate
+
+    @contextlib.contextmanager
+    def trace(self, name, **attributes):
+        """Starts a sampled trace, its root span is `name`. Nested traces join the outer one."""
+        if self.sample_rate is None:
+            self.configure()
+        if _current_trace.get() is not None or not self.sample_rate or random.random() >= self.sample_rate:
+            with self.span(name, **attributes):
+                yield
+            return
+
+        token = _current_trace.set(secrets.token_hex(8))
+        try:
+            with self.span(name, **attributes):
+                yield
+        finally:
+            _current_trace.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        trace_id = _current_trace.get()
+        if trace_id is None:
+            yield
+            return
+
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            attributes['error'] = True
+            raise
+        finally:
+            record = {'trace': trace_id, 'span': name, 'start': start,
+                      'ms': (time.perf_counter() - started) * 1000, **attributes}
+            self.logger.info(json.dumps(record, default=str))
+
+
+tracer = Tracer()
+
+
+def traced(name):
+    """Decorator: the call becomes a span of the current trace, if there is one."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def read_spans(path):
+    # rotated files first, oldest to newest
+    paths = sorted(glob.glob(f"{glob.escape(path)}.*"), key=lambda p: -int(p.rsplit('.', 1)[1])
+                   if p.rsplit('.', 1)[1].isdigit() else 0) + [path]
+    for span_path in paths:
+        try:
+            with open(span_path) as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def summarize(spans):
+    durations = {}
+    for span in spans:
+        durations.setdefault(span['span'], []).append(span['ms'])
+
+    lines = [f"{'Span':<20} {'Count':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for name, values in sorted(durations.items(), key=lambda item: -np.percentile(item[1], 99)):
+        p50, p99 = np.percentile(values, [50, 99])
+        lines.append(f"{name:<20} {len(values):>7} {p50:>9.2f} {p99:>9.2f} {max(values):>9.2f}")
+    return '\n'.join(lines)
+
+
+def timeline(spans, trace_id):
+    spans = sorted((span for span in spans if span['trace'] == trace_id), key=lambda span: span['start'])
+    if not spans:
+        return f"Trace {trace_id} not found"
+
+    origin = spans[0]['start']
+    lines = []
+    for span in spans:
+        attributes = ' '.join(f"{key}={value}" for key, value in span.items()
+                              if key not in ('trace', 'span', 'start', 'ms'))
+        lines.append(f"+{(span['start'] - origin) * 1000:>9.2f} ms {span['span']:<20} {span['ms']:>9.2f} ms  {attributes}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    from config import TraceConfig
+
+    parser = argparse.ArgumentParser(description="Summarize candle pipeline traces")
+    parser.add_argument("path", nargs='?', default=TraceConfig.path)
+    parser.add_argument("--trace", help="print the timeline of one trace id instead")
+    args = parser.parse_args()
+
+    spans = read_spans(args.path)
+    print(timeline(spans, args.trace) if args.trace else summarize(spans))
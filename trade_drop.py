@@ -1,9 +1,13 @@
 import datetime
 
+from config import BacktestConfig
+from dispatcher import trade_dispatcher
 from logger_output import log
 from market_data import price_tracker
-from order_management import open_position, close_position
+from metrics import metrics
+from order_management import open_position, close_position, order_quantity
 from formatting import format_number, format_price
+from tracing import tracer
 
 
 def calculate_commission(size, is_taker=True):
@@ -14,9 +18,9 @@ def calculate_commission(size, is_taker=True):
     commission = size * fee_rate
     return commission
 
-def calculate_pnl(position_state, price=None):
+def calculate_pnl(position_state, price=None, symbol=None):
     if price is None:
-        price = price_tracker.get_price()
+        price = price_tracker.get_price(symbol)
 
     if position_state.long_position_opened and position_state.long_entry_price:
         return (price - position_state.long_entry_price) * (position_state.long_entry_full_size / position_state.long_entry_price)
@@ -44,7 +48,7 @@ def update_balance_and_stats(timestamp, trade_type, price, size, comment, profit
         else:
             strategy_stats.successful_trades += 1
 
-    strategy_stats.append_trade(strategy.user_id, strategy.strategy_id, {
+    return strategy_stats.append_trade(strategy.user_id, strategy.strategy_id, {
         'timestamp': timestamp,
         'trade_type': trade_type,
         'price': price,
@@ -62,29 +66,27 @@ def update_balance_and_stats(timestamp, trade_type, price, size, comment, profit
 def log_trade(timestamp, trade_type, size, comment, strategy, user, price=None):
     profit_loss = 0.0
     position_state = strategy.position_state
+    symbol = strategy.strategy_config.symbol
     if not price:
-        price = price_tracker.get_price()
+        price = price_tracker.get_price(symbol)
 
     leverage = strategy.strategy_config.leverage
     full_position_size = size * leverage
 
+    # the order quantity is settled here with the state, the worker only sends what it is given
     if "Open" in trade_type:
-        if trade_type == "Open Long":
-            open_position('LONG', position_state, size, leverage)
-        elif trade_type == "Open Short":
-            open_position('SHORT', position_state, size, leverage)
+        quantity = order_quantity(size, leverage, price)
         position_state.open(trade_type, size, price, leverage)
+        position_state.position_qty = round(position_state.position_qty + quantity, 3)
     elif "Close" in trade_type:
-        if trade_type == "Close Long":
-            close_position('LONG', position_state, size)
-        elif trade_type == "Close Short":
-            close_position('SHORT', position_state, size)
+        quantity = position_state.position_qty
         profit_loss, entry_price = position_state.close_all(trade_type, price)
 
     formatted_timestamp = timestamp.strftime('%d.%m.%Y %H:%M')
-    update_balance_and_stats(formatted_timestamp, trade_type, price, size, comment, profit_loss, leverage, strategy)
-
-    strategy.store_state()
+    trade_params = update_balance_and_stats(formatted_timestamp, trade_type, price, size, comment, profit_loss,
+                                            leverage, strategy)
+    # taken now, the worker may run after the next trades changed the state
+    records = [("trade_logs", trade_params)] + strategy.state_records()
 
     # price_color = "🍏" if "Long" in trade_type else "🍎"
     action = "🏁" if "Close" in trade_type else "🛒"
@@ -101,8 +103,10 @@ def log_trade(timestamp, trade_type, size, comment, strategy, user, price=None):
         formatted_timestamp = dt.strftime("%d.%m %H:%M")
         return formatted_timestamp
 
+    market = (f" {symbol}" if symbol != BacktestConfig.symbol else '') + \
+             (f" {strategy.strategy_config.interval}" if strategy.strategy_config.interval != BacktestConfig.interval else '')
     formatted_signal = (
-        f"🎰 *{strategy.strategy_config.name} trade* ⚡\n"
+        f"🎰 *{strategy.strategy_config.name}{market} trade* ⚡\n"
         f"{action} {trade_type} | 🕓 {fix_timestamp(formatted_timestamp)}\n"
         # f"\n"
         f"💰 {price_or_price_change} | 📦 `{full_position_size:,.0f}$` (`{leverage}x`)\n"
@@ -110,7 +114,23 @@ def log_trade(timestamp, trade_type, size, comment, strategy, user, price=None):
         f"💬 {comment}\n"
     )
 
-    log(f"{formatted_signal}", user.user_id)
+    def side_effects():
+        with tracer.span("trade", user=user.user_id, trade=trade_type):
+            with metrics.timer("orders"):
+                if trade_type == "Open Long":
+                    open_position('LONG', quantity, symbol)
+                elif trade_type == "Open Short":
+                    open_position('SHORT', quantity, symbol)
+                elif trade_type == "Close Long":
+                    close_position('LONG', quantity, symbol)
+                elif trade_type == "Close Short":
+                    close_position('SHORT', quantity, symbol)
+
+            strategy.store_records(records)
+            log(f"{formatted_signal}", user.user_id)
+
+    # orders, database and Telegram are slow, the live loop only waits for the state update above
+    trade_dispatcher.submit(user.user_id, side_effects)
 
 def force_close_all(strategy, user):
     position_state = strategy.position_state
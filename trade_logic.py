@@ -1,5 +1,13 @@
+import operator
+import traceback
+
+import numpy as np
+
 from trade_drop import log_trade
-from logger_output import log
+from logger_output import log, log_error
+from metrics import metrics
+from tracing import tracer, traced
+from config import BacktestConfig, StateVersion
 from state import MarketState
 
 
@@ -12,83 +20,362 @@ def is_high_volume(row):
 #     position_size = 300.0 #risk_per_trade / atr  # учитываем волатильность
 #     return position_size * BacktestConfig.LEVERAGE
 
-def determine_trend(row, user=None, user_id=None):
+def trend_of(row):
+    """(trend, trend type) of a row by its EMAs, without touching the market state."""
     ema_7 = row['EMA_7']
     ema_25 = row['EMA_25']
     ema_99 = row['EMA_99']
 
-    old_trend_type = MarketState.trend_type
-    old_trend = MarketState.trend
-
     if ema_7 < ema_25:
-        MarketState.trend = "SHORT"
-        MarketState.trend_type = "STRONG" if ema_7 < ema_99 else "WEAK"
-    else:
-        MarketState.trend = "LONG"
-        MarketState.trend_type = "WEAK" if ema_7 < ema_99 else "STRONG"
+        return "SHORT", "STRONG" if ema_7 < ema_99 else "WEAK"
+    return "LONG", "WEAK" if ema_7 < ema_99 else "STRONG"
 
-    if MarketState.trend_type != old_trend_type or MarketState.trend != old_trend:
+@traced("determine_trend")
+def determine_trend(row, user=None, user_id=None, market=None, market_state=None):
+    """Sets the trend of `market_state` (default: the backtest market) from a closed candle, alerts on changes."""
+    market_state = market_state or MarketState.of()
+    old_trend_type = market_state.trend_type
+    old_trend = market_state.trend
+
+    market_state.trend, market_state.trend_type = trend_of(row)
+
+    if market_state.trend_type != old_trend_type or market_state.trend != old_trend:
         if not user_id or user.user_settings.alerts_enabled:
-            is_downtrend = MarketState.trend == 'SHORT'
-            if MarketState.trend != old_trend:
-                log(f"⚠️ *{MarketState.trend_type.capitalize()} {'downtrend' if is_downtrend else 'uptrend'} started!* {'📉' if is_downtrend else '📈'}",
+            is_downtrend = market_state.trend == 'SHORT'
+            market = f"*{market}* " if market else ''
+            if market_state.trend != old_trend:
+                log(f"⚠️ {market}*{market_state.trend_type.capitalize()} {'downtrend' if is_downtrend else 'uptrend'} started!* {'📉' if is_downtrend else '📈'}",
                     user=user_id)
-            elif MarketState.trend_type != old_trend_type:
-                log(f"⚠️ *{'Downtrend' if is_downtrend else 'Uptrend'} becomes {MarketState.trend_type.lower()}!* {'📉📉📉' if is_downtrend else '📈📈📈'}",
+            elif market_state.trend_type != old_trend_type:
+                log(f"⚠️ {market}*{'Downtrend' if is_downtrend else 'Uptrend'} becomes {market_state.trend_type.lower()}!* {'📉📉📉' if is_downtrend else '📈📈📈'}",
                     user=user_id)
 
-    return MarketState.trend, MarketState.trend_type
+    return market_state.trend, market_state.trend_type
+
+
+# StrategyConfig fields the trades depend on, name and leverage only change how a trade is logged and sized
+DECISION_FIELDS = ('high_volume_only', 'position_size', 'min_adx', 'allow_weak_trend', 'close_on_trend_reverse',
+                   'long_buy_rsi_enter', 'long_buy_additional_enter', 'long_buy_rsi_exit',
+                   'short_sell_rsi_enter', 'short_sell_additional_enter', 'short_sell_rsi_exit')
+POSITION_FIELDS = ('long_position_opened', 'long_positions', 'long_entry_size',
+                   'short_position_opened', 'short_positions', 'short_entry_size')
+KEY_FIELDS = DECISION_FIELDS + POSITION_FIELDS
+
+_decision_values = operator.attrgetter(*DECISION_FIELDS)
+
+
+def decision_key(strategy):
+    """Strategies with equal keys get the same trades from the same row, the fields are KEY_FIELDS."""
+    config = strategy.strategy_config
+    position_state = strategy.position_state
+    return _decision_values(config) + \
+        (bool(position_state.long_position_opened), position_state.long_positions, position_state.long_entry_size,
+         bool(position_state.short_position_opened), position_state.short_positions, position_state.short_entry_size)
+
+
+def key_table(keys):
+    return np.array(keys, dtype=np.float64).reshape(len(keys), len(KEY_FIELDS))
+
 
+def acting_groups(row, table, market_state):
+    """
+    Rows of `table` (decision keys, see key_table) for which decide_trades returns any trade
+    on this row, computed for all of them in one vectorized pass.
+    """
+    if market_state.trend not in ("LONG", "SHORT") or not len(table):
+        return np.empty(0, dtype=np.int64)
 
-def trade_logic(row, timestamp, latest_price, strategy, user):
+    column = {field: table[:, i] for i, field in enumerate(KEY_FIELDS)}
+    rsi_6 = float(row['RSI_6'])
+
+    eligible = (float(row['ADX']) > column['min_adx']) & ((column['high_volume_only'] == 0) | is_high_volume(row))
+    if market_state.trend_type != "STRONG":
+        eligible &= column['allow_weak_trend'] != 0
+
+    if market_state.trend == "LONG":
+        opened, positions = column['long_position_opened'] != 0, column['long_positions']
+        reverse = column['short_position_opened'] != 0
+        close = opened & (rsi_6 > column['long_buy_rsi_exit'])
+        enter = rsi_6 < column['long_buy_rsi_enter']
+        additional = rsi_6 < column['long_buy_additional_enter']
+    else:
+        opened, positions = column['short_position_opened'] != 0, column['short_positions']
+        reverse = column['long_position_opened'] != 0
+        close = opened & (rsi_6 < column['short_sell_rsi_exit'])
+        enter = rsi_6 > column['short_sell_rsi_enter']
+        additional = rsi_6 > column['short_sell_additional_enter']
+
+    # same sequence as decide_trades: close, then open, then DCA on the first entry
+    still_opened = opened & ~close
+    open_now = ~still_opened & enter
+    positions_after = np.where(close, 0, positions) + open_now
+    dca = (still_opened | open_now) & (positions_after == 1) & additional
+    reversal = reverse & (column['close_on_trend_reverse'] != 0)
+
+    return np.flatnonzero(eligible & (reversal | close | open_now | dca))
+
+
+def decide_trades(row, strategy_config, position_state, market_state):
+    """
+    Trades trade_logic makes on this row of the market in `market_state` as (trade type, size,
+    comment), in execution order. Only reads the position state, the opened flags and entry
+    counts are followed locally.
+    """
     rsi_6 = row['RSI_6']
     # atr = row['ATR']
     adx = row['ADX']
     # macd = row['MACD']
-    # Calculate max drawdown
 
-    strategy_config = strategy.strategy_config
+    trades = []
+    if not (adx > strategy_config.min_adx and (not strategy_config.high_volume_only or is_high_volume(row))):
+        return trades
+
+    if not strategy_config.allow_weak_trend and market_state.trend_type != "STRONG":
+        # log(f"{timestamp} Trend is not strong, no decision")
+        return trades
+
+    position_size = strategy_config.position_size
+    long_opened, long_positions = position_state.long_position_opened, position_state.long_positions
+    short_opened, short_positions = position_state.short_position_opened, position_state.short_positions
+
+    if market_state.trend == "LONG":
+        if short_opened and strategy_config.close_on_trend_reverse:
+            short_opened, short_positions = False, 0
+            trades.append(('Close Short', position_state.short_entry_size, "Trend reversal"))
+
+        if long_opened and rsi_6 > strategy_config.long_buy_rsi_exit:
+            long_opened, long_positions = False, 0
+            trades.append(('Close Long', position_state.long_entry_size, f"RSI > {strategy_config.long_buy_rsi_exit}"))
+
+        if not long_opened and rsi_6 < strategy_config.long_buy_rsi_enter:
+            long_opened, long_positions = True, long_positions + 1
+            trades.append(('Open Long', position_size, f"RSI < {strategy_config.long_buy_rsi_enter}"))
+
+        if long_opened and long_positions == 1 and rsi_6 < strategy_config.long_buy_additional_enter:
+            trades.append(('Open Long', position_size, f"DCA RSI < {strategy_config.long_buy_additional_enter}"))
 
-    # Trade Logic
-    if adx > strategy_config.min_adx and (not strategy_config.high_volume_only or is_high_volume(row)):
-        position_size = strategy_config.position_size
+    elif market_state.trend == "SHORT":
+        if long_opened and strategy_config.close_on_trend_reverse:
+            long_opened, long_positions = False, 0
+            trades.append(('Close Long', position_state.long_entry_size, "Trend reversal"))
 
-        if not strategy_config.allow_weak_trend and MarketState.trend_type != "STRONG":
-            # log(f"{timestamp} Trend is not strong, no decision")
+        if short_opened and rsi_6 < strategy_config.short_sell_rsi_exit:
+            short_opened, short_positions = False, 0
+            trades.append(('Close Short', position_state.short_entry_size, f"RSI < {strategy_config.short_sell_rsi_exit}"))
+
+        if not short_opened and rsi_6 > strategy_config.short_sell_rsi_enter:
+            short_opened, short_positions = True, short_positions + 1
+            trades.append(('Open Short', position_size, f"RSI > {strategy_config.short_sell_rsi_enter}"))
+
+        if short_opened and short_positions == 1 and rsi_6 > strategy_config.short_sell_additional_enter:
+            trades.append(('Open Short', position_size, f"DCA RSI > {strategy_config.short_sell_additional_enter}"))
+
+    return trades
+
+
+def decide_exits(row, strategy_config, position_state, market_state):
+    """The closing trades of decide_trades, they come first and do not depend on the entries."""
+    return [trade for trade in decide_trades(row, strategy_config, position_state, market_state)
+            if trade[0].startswith('Close')]
+
+
+def apply_trades(trades, timestamp, strategy, user):
+    position_state = strategy.position_state
+    for trade_type, size, comment in trades:
+        if trade_type == 'Open Long':
+            position_state.long_position_opened = True
+        elif trade_type == 'Open Short':
+            position_state.short_position_opened = True
+        elif trade_type == 'Close Long':
+            position_state.long_position_opened = False
+        elif trade_type == 'Close Short':
+            position_state.short_position_opened = False
+        log_trade(timestamp, trade_type, size, comment, strategy, user)
+
+
+def trade_logic(row, timestamp, latest_price, strategy, user, market_state=None):
+    trades = decide_trades(row, strategy.strategy_config, strategy.position_state, market_state or MarketState.of())
+    apply_trades(trades, timestamp, strategy, user)
+
+
+def group_strategies(users, symbol=None, interval=None):
+    """
+    {decision key: [(strategy, user)]} over all strategies of all users trading `symbol`
+    on `interval` (default: all).
+    """
+    groups = {}
+    for user_data in users:
+        # users add strategies from the bot thread while a candle groups them
+        for strategy in list(user_data.strategies.strategies.values()):
+            if symbol is not None and strategy.strategy_config.symbol != symbol:
+                continue
+            if interval is not None and strategy.strategy_config.interval != interval:
+                continue
+            groups.setdefault(decision_key(strategy), []).append((strategy, user_data))
+    return groups
+
+
+class StrategyIndex:
+    """
+    Strategy groups (see group_strategies) indexed by their RSI thresholds: per trend side,
+    sorted enter thresholds of groups without a position, exit thresholds of open positions
+    and DCA thresholds of single entries, plus the groups a trend reversal closes.
+    A candle looks up the groups whose threshold condition holds for its RSI with binary
+    searches, O(log n + k), and only those go through the vectorized eligibility check.
+
+    The index is rebuilt from all strategies only when StateVersion changed, i.e. a config
+    or position was edited outside of the trades applied here. Groups that traded are moved
+    to their new keys and the lookups are rebuilt over the groups, not over every strategy.
+    """
+    def __init__(self, symbol=None, interval=None):
+        self.symbol = symbol
+        self.interval = interval
+        self.version = None
+        self.groups = {}
+        self.keys = []
+        self.table = None
+        self.lookups = {}
+        self.reversal = {}
+
+    def refresh(self, users):
+        if self.version == StateVersion.value:
+            return
+        # read first: an edit made while grouping triggers another rebuild, and the users are only
+        # listed after it, so a user added meanwhile is either listed or bumps the version again
+        self.version = StateVersion.value
+        self.groups = group_strategies(list(users), self.symbol, self.interval)
+        self.build()
+
+    def build(self):
+        self.keys = list(self.groups)
+        try:
+            self.table = key_table(self.keys)
+        except (TypeError, ValueError) as table_exception:
+            # a config value that is not numeric, every group is decided one by one
+            log_error(f"Strategy index failed: {table_exception}")
+            self.table = None
             return
 
-        position_state = strategy.position_state
+        column = {field: self.table[:, i] for i, field in enumerate(KEY_FIELDS)}
+        long_opened = column['long_position_opened'] != 0
+        short_opened = column['short_position_opened'] != 0
+        close_on_trend_reverse = column['close_on_trend_reverse'] != 0
+
+        def sorted_thresholds(mask, thresholds):
+            ids = np.flatnonzero(mask)
+            order = np.argsort(thresholds[ids], kind='stable')
+            return thresholds[ids][order], ids[order]
+
+        self.lookups = {
+            'long_enter': sorted_thresholds(~long_opened, column['long_buy_rsi_enter']),
+            'long_exit': sorted_thresholds(long_opened, column['long_buy_rsi_exit']),
+            'long_dca': sorted_thresholds(long_opened & (column['long_positions'] == 1),
+                                          column['long_buy_additional_enter']),
+            'short_enter': sorted_thresholds(~short_opened, column['short_sell_rsi_enter']),
+            'short_exit': sorted_thresholds(short_opened, column['short_sell_rsi_exit']),
+            'short_dca': sorted_thresholds(short_opened & (column['short_positions'] == 1),
+                                           column['short_sell_additional_enter']),
+        }
+        self.reversal = {"LONG": np.flatnonzero(short_opened & close_on_trend_reverse),
+                         "SHORT": np.flatnonzero(long_opened & close_on_trend_reverse)}
+
+    def above(self, lookup, rsi):
+        """Groups with threshold > rsi."""
+        thresholds, ids = self.lookups[lookup]
+        return ids[np.searchsorted(thresholds, rsi, side='right'):]
+
+    def below(self, lookup, rsi):
+        """Groups with threshold < rsi."""
+        thresholds, ids = self.lookups[lookup]
+        return ids[:np.searchsorted(thresholds, rsi, side='left')]
+
+    def candidates(self, rsi_6, trend):
+        """Superset of the groups that trade at this RSI, the trend side decides the comparisons."""
+        parts = [self.reversal[trend]]
+        # NaN RSI compares as False in trade_logic, only trend reversals can trade
+        if not np.isnan(rsi_6):
+            if trend == "LONG":
+                parts += [self.above('long_enter', rsi_6), self.below('long_exit', rsi_6), self.above('long_dca', rsi_6)]
+            else:
+                parts += [self.below('short_enter', rsi_6), self.above('short_exit', rsi_6), self.below('short_dca', rsi_6)]
+        return np.unique(np.concatenate(parts))
+
+    def acting(self, row, market_state):
+        """Decision keys of the groups that trade on this row."""
+        if self.table is None:
+            return list(self.keys)
+        if market_state.trend not in ("LONG", "SHORT"):
+            return []
+
+        candidates = self.candidates(float(row['RSI_6']), market_state.trend)
+        return [self.keys[i] for i in candidates[acting_groups(row, self.table[candidates], market_state)]]
+
+    def exiting(self, row, market_state):
+        """Decision keys of the groups that may close a position on this row, a superset."""
+        if self.table is None:
+            return list(self.keys)
+        if market_state.trend not in ("LONG", "SHORT"):
+            return []
+
+        rsi_6 = float(row['RSI_6'])
+        parts = [self.reversal[market_state.trend]]
+        if not np.isnan(rsi_6):
+            parts.append(self.below('long_exit', rsi_6) if market_state.trend == "LONG" else self.above('short_exit', rsi_6))
+        return [self.keys[i] for i in np.unique(np.concatenate(parts))]
 
-        if MarketState.trend == "LONG":
-            if position_state.short_position_opened and strategy_config.close_on_trend_reverse:
-                position_state.short_position_opened = False
-                log_trade(timestamp, 'Close Short', position_state.short_entry_size, "Trend reversal", strategy, user)
+    def move(self, key):
+        """Regroups the members of `key` after their trades were applied."""
+        for strategy, user_data in self.groups.pop(key):
+            self.groups.setdefault(decision_key(strategy), []).append((strategy, user_data))
 
-            if position_state.long_position_opened and rsi_6 > strategy_config.long_buy_rsi_exit:
-                position_state.long_position_opened = False
-                log_trade(timestamp, 'Close Long', position_state.long_entry_size, f"RSI > {strategy_config.long_buy_rsi_exit}", strategy, user)
 
-            if not position_state.long_position_opened and rsi_6 < strategy_config.long_buy_rsi_enter:
-                position_state.long_position_opened = True
-                log_trade(timestamp, 'Open Long', position_size, f"RSI < {strategy_config.long_buy_rsi_enter}", strategy, user)
+strategy_indexes = {}  # (symbol, interval): StrategyIndex
 
-            if position_state.long_position_opened and position_state.long_positions == 1 and rsi_6 < strategy_config.long_buy_additional_enter:
-                log_trade(timestamp, 'Open Long', position_size,
-                          f"DCA RSI < {strategy_config.long_buy_additional_enter}", strategy, user)
 
-        elif MarketState.trend == "SHORT":
-            if position_state.long_position_opened and strategy_config.close_on_trend_reverse:
-                position_state.long_position_opened = False
-                log_trade(timestamp, 'Close Long', position_state.long_entry_size, "Trend reversal", strategy, user)
+def trade_logic_all(row, timestamp, latest_price, users, symbol=None, interval=None, exits_only=False):
+    """
+    trade_logic for every strategy of every user that trades `symbol` on `interval` (default:
+    the backtest symbol and interval). Strategies with the same config and position state are
+    grouped, the groups that trade on this row are looked up in the market's strategy index
+    and only those are decided and applied to each member.
+    `exits_only` (provisional intrabar rows) only closes positions, entries wait for the close.
+    """
+    market = (symbol or BacktestConfig.symbol, interval or BacktestConfig.interval)
+    strategy_index = strategy_indexes.get(market)
+    if strategy_index is None:
+        strategy_index = strategy_indexes[market] = StrategyIndex(*market)
+    strategy_index.refresh(users)
+    market_state = MarketState.of(*market)
 
-            if position_state.short_position_opened and rsi_6 < strategy_config.short_sell_rsi_exit:
-                position_state.short_position_opened = False
-                log_trade(timestamp, 'Close Short', position_state.short_entry_size, f"RSI < {strategy_config.short_sell_rsi_exit}", strategy, user)
+    traded = []
+    decide = decide_exits if exits_only else decide_trades
+    for key in strategy_index.exiting(row, market_state) if exits_only else strategy_index.acting(row, market_state):
+        members = strategy_index.groups[key]
+        strategy, _ = members[0]
+        try:
+            with tracer.span("trade_logic", members=len(members)):
+                trades = decide(row, strategy.strategy_config, strategy.position_state, market_state)
+        except Exception as decision_exception:
+            metrics.error("strategies")
+            log_error(f"Strategy decision failed: {decision_exception}\n"
+                      f"{traceback.format_exc()}")
+            continue
 
-            if not position_state.short_position_opened and rsi_6 > strategy_config.short_sell_rsi_enter:
-                position_state.short_position_opened = True
-                log_trade(timestamp, 'Open Short', position_size, f"RSI > {strategy_config.short_sell_rsi_enter}", strategy, user)
+        if not trades:
+            continue
+        # the index follows these edits itself
+        with StateVersion.paused():
+            for strategy, user_data in members:
+                try:
+                    apply_trades(trades, timestamp, strategy, user_data)
+                except Exception as user_exception:
+                    metrics.error("strategies")
+                    log_error(f"User strategy failed: {user_exception}\n"
+                              f"{traceback.format_exc()}")
+        traded.append(key)
 
-            if position_state.short_position_opened and position_state.short_positions == 1 and rsi_6 > strategy_config.short_sell_additional_enter:
-                log_trade(timestamp, 'Open Short', position_size,
-                          f"DCA RSI > {strategy_config.short_sell_additional_enter}", strategy, user)
+    # regrouped only after the whole pass, a strategy must not join a group that trades later on this candle
+    if traded:
+        for key in traded:
+            strategy_index.move(key)
+        strategy_index.build()
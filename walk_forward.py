@@ -0,0 +1,104 @@
+from backtest_engine import BacktestArrays
+from config import OptimizerConfig, StrategyConfig
+from strategy_optimizer import evaluate, evaluate_parallel, grid, make_config, rank, DEFAULT_SWEEP_SPACE
+
+
+def walk_forward_windows(length, train_size, test_size, step=None):
+    """(train_start, train_end, test_end) candle ranges, the test slice directly follows its train slice."""
+    step = step or test_size
+    windows = []
+    train_start = 0
+    while train_start + train_size + test_size <= length:
+        windows.append((train_start, train_start + train_size, train_start + train_size + test_size))
+        train_start += step
+    return windows
+
+
+class WalkForward:
+    """
+    Walk-forward validation: every train slice is re-optimized over the parameter sets and
+    the winner is scored on the following, unseen test slice. Indicators are computed once
+    over the whole history and every window works on views of the same shared arrays, so
+    overlapping windows reuse the indicator state instead of warming it up again.
+    All train slices are evaluated together on one process pool.
+    """
+    def __init__(self, history, train_size=None, test_size=None, step=None, base_config=None, workers=None):
+        self.arrays = history if isinstance(history, BacktestArrays) else BacktestArrays(history)
+        self.train_size = train_size or OptimizerConfig.walk_forward_train
+        self.test_size = test_size or OptimizerConfig.walk_forward_test
+        self.windows = walk_forward_windows(len(self.arrays), self.train_size, self.test_size, step)
+        self.base_config = base_config or StrategyConfig("Walk forward")
+        self.workers = workers or OptimizerConfig.workers
+
+    def optimize(self, parameter_sets, key='pnl', batch_size=None):
+        batch_size = batch_size or OptimizerConfig.batch_size
+        parameter_sets = list(parameter_sets)
+        tasks = [((train_start, train_end), parameter_sets[i:i + batch_size])
+                 for train_start, train_end, _ in self.windows
+                 for i in range(0, len(parameter_sets), batch_size)]
+
+        train_results = {}
+        for window, results in evaluate_parallel(self.arrays, self.base_config, tasks, self.workers):
+            train_results.setdefault(window, []).extend(results)
+
+        return {window: rank(results, key)[0] for window, results in train_results.items()}
+
+    def run(self, parameter_sets, baselines=None, key='pnl'):
+        """
+        Returns one row per window with the train winner, its out-of-sample test result
+        and the test results of the `baselines` ({name: StrategyConfig}) on the same slice.
+        """
+        best = self.optimize(parameter_sets, key)
+        baselines = baselines or {}
+
+        rows = []
+        for train_start, train_end, test_end in self.windows:
+            winner = best[(train_start, train_end)]
+            test_arrays = self.arrays.slice(train_end, test_end)
+            rows.append({
+                'train': (self.arrays.timestamps[train_start], self.arrays.timestamps[train_end - 1]),
+                'test': (self.arrays.timestamps[train_end], self.arrays.timestamps[test_end - 1]),
+                'train_result': winner,
+                'test_result': evaluate(test_arrays, make_config(self.base_config, winner['parameters']),
+                                        winner['parameters']),
+                'baselines': {name: evaluate(test_arrays, config) for name, config in baselines.items()},
+            })
+        return rows
+
+
+def format_walk_forward(rows):
+    if not rows:
+        return "History is too short for a single walk-forward window"
+
+    baseline_names = list(rows[0]['baselines'])
+    lines = [f"{'Test window':<24} {'Train PnL':>10} {'Test PnL':>10} "
+             + ' '.join(f"{name[:18]:>18}" for name in baseline_names)]
+    totals = {'optimized': 0.0, **{name: 0.0 for name in baseline_names}}
+    for row in rows:
+        test_start, test_end = row['test']
+        totals['optimized'] += row['test_result']['pnl']
+        for name in baseline_names:
+            totals[name] += row['baselines'][name]['pnl']
+        lines.append(f"{test_start:%d.%m.%y %H:%M}-{test_end:%d.%m %H:%M} "
+                     f"{row['train_result']['pnl']:>10.2f} {row['test_result']['pnl']:>10.2f} "
+                     + ' '.join(f"{row['baselines'][name]['pnl']:>18.2f}" for name in baseline_names))
+
+    lines.append(f"{'Out of sample total':<24} {'':>10} {totals['optimized']:>10.2f} "
+                 + ' '.join(f"{totals[name]:>18.2f}" for name in baseline_names))
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    from historical_data_loader import HistoricalDataLoader
+    from state import UserStrategies
+
+    history_data_loader = HistoricalDataLoader(backload=False, forward_load=False)
+    default_strategies = UserStrategies(None).setup_default_strategies()
+
+    # same sizing and leverage as the defaults, so the comparison is only about thresholds
+    walk_forward = WalkForward(history_data_loader.historical_data,
+                               base_config=default_strategies[0].strategy_config)
+    rows = walk_forward.run(grid(DEFAULT_SWEEP_SPACE),
+                            baselines={strategy.strategy_config.name: strategy.strategy_config
+                                       for strategy in default_strategies})
+    print(format_walk_forward(rows))